@@ -1,22 +1,68 @@
 import os
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=4)
+def _parse_env_file(path: str, mtime_ns: int, size: int) -> dict[str, str]:
+    """Parse KEY=VALUE lines of a .env file (cached per file mtime/size)."""
+    values: dict[str, str] = {}
+    with open(path, "rb") as f:
+        lines = f.read().decode("utf-8").splitlines()
+    for raw in lines:
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export "):].lstrip()
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
+            value = value[1:-1]
+        else:
+            # Drop inline comments on unquoted values
+            value = value.split(" #", 1)[0].rstrip()
+        values[key.strip()] = value
+    return values
+
+
+def _load_env(path: Path) -> None:
+    """Load a .env file without overriding variables already set."""
+    if os.getenv("ENV") == "production":
+        # Production environments are provided by the orchestrator
+        return
+    try:
+        stat = path.stat()
+    except OSError:
+        return
+    for key, value in _parse_env_file(str(path), stat.st_mtime_ns, stat.st_size).items():
+        os.environ.setdefault(key, value)
+
 
 # Base directories
 BASE_DIR = Path(__file__).parent.parent.parent
 
 # Load environment variables from project .env
-load_dotenv(BASE_DIR / ".env")
+_load_env(BASE_DIR / ".env")
 BACKEND_DIR = BASE_DIR / "backend"
 FRONTEND_BUILD_DIR = BASE_DIR / "build"
 
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR}/data/webui.db")
+# Connection pool for server databases (PostgreSQL) and the async SQLite engine
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
 
 # Security
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Authenticated users are cached per process between token checks (0 disables)
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))  # seconds
 
 # OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -26,14 +72,50 @@ OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 # App settings
 APP_NAME = "mini-webui"
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "30"))  # seconds; 0 disables
+
+# Streaming: LLM chunks are coalesced into growing SSE batches (1, 3, 9, 27, 50 chunks)
+SSE_MIN_BATCH = int(os.getenv("SSE_MIN_BATCH", "1"))
+SSE_MAX_BATCH = int(os.getenv("SSE_MAX_BATCH", "50"))
+SSE_BATCH_GROWTH = int(os.getenv("SSE_BATCH_GROWTH", "3"))
+SSE_FLUSH_CHARS = int(os.getenv("SSE_FLUSH_CHARS", "256"))
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "25")) / 1000
+SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", "15"))  # seconds between idle pings
+# Completions for identical low-temperature requests are reused (size 0 disables)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))  # seconds
+RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.3"))
+# Most recent transcript messages sent to the model per turn (0 = whole history)
+LLM_HISTORY_MAX_MESSAGES = int(os.getenv("LLM_HISTORY_MAX_MESSAGES", "64"))
+# Upper bound on the guest stream's JSON history query parameter
+GUEST_HISTORY_MAX_CHARS = int(os.getenv("GUEST_HISTORY_MAX_CHARS", "65536"))
+# Server-side guest histories, addressed by the conversation_id returned to the client
+GUEST_SESSION_MAX = int(os.getenv("GUEST_SESSION_MAX", "10000"))
+GUEST_SESSION_TTL = float(os.getenv("GUEST_SESSION_TTL", "3600"))  # seconds idle
+GUEST_SESSION_MAX_MESSAGES = int(os.getenv("GUEST_SESSION_MAX_MESSAGES", "64"))
 
 # RAG / LangGraph settings
 RAG_ENABLED = os.getenv("RAG_ENABLED", "false").lower() == "true"
 RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
-RAG_EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-large")
+RAG_EMBEDDING_BACKEND = os.getenv("RAG_EMBEDDING_BACKEND", "openai").lower()  # openai | onnx | st
+RAG_EMBEDDING_MODEL = os.getenv(
+    "RAG_EMBEDDING_MODEL",
+    "text-embedding-3-large" if RAG_EMBEDDING_BACKEND == "openai" else "BAAI/bge-small-en-v1.5",
+)
 RAG_INDEX_PATH = os.getenv("RAG_INDEX_PATH", str(BASE_DIR / "data" / "rag_index"))
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "auto").lower()  # auto | flat | hnsw | ivfpq
+RAG_INDEX_QUANT = os.getenv("RAG_INDEX_QUANT", "none").lower()  # none | sq8 | pq
+RAG_INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "true").lower() == "true"
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "10000"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "512"))
+# Embedding batches in flight during ingestion; API calls overlap, local models
+# already use every core for a single batch
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4" if RAG_EMBEDDING_BACKEND == "openai" else "1"))
+RAG_SPLITTER_BACKEND = os.getenv("RAG_SPLITTER_BACKEND", "semantic").lower()  # semantic | langchain
 RAG_LANGUAGE = os.getenv("RAG_LANGUAGE", "ja")
 RAG_ALLOW_STREAMING = os.getenv("RAG_ALLOW_STREAMING", "true").lower() == "true"
+RAG_STREAM_COALESCE_MS = float(os.getenv("RAG_STREAM_COALESCE_MS", "50"))  # 0 disables frame batching
+RAG_STREAM_COALESCE_BYTES = int(os.getenv("RAG_STREAM_COALESCE_BYTES", "512"))
 RAG_COMPLETION_MODEL = os.getenv("RAG_COMPLETION_MODEL", OPENAI_MODEL)
 RAG_SYSTEM_PROMPT = os.getenv(
     "RAG_SYSTEM_PROMPT",
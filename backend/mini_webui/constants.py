@@ -1,18 +1,21 @@
+import sys
+
+# Interned so role strings built at runtime compare by identity first
 # User roles
-USER_ROLE_ADMIN = "admin"
-USER_ROLE_USER = "user"
+USER_ROLE_ADMIN = sys.intern("admin")
+USER_ROLE_USER = sys.intern("user")
 
 # Default models
 DEFAULT_MODELS = [
-    "gpt-3.5-turbo",
-    "gpt-4",
-    "gpt-4-turbo-preview"
+    sys.intern("gpt-3.5-turbo"),
+    sys.intern("gpt-4"),
+    sys.intern("gpt-4-turbo-preview"),
 ]
 
 # Message types
-MESSAGE_TYPE_USER = "user"
-MESSAGE_TYPE_ASSISTANT = "assistant"
-MESSAGE_TYPE_SYSTEM = "system"
+MESSAGE_TYPE_USER = sys.intern("user")
+MESSAGE_TYPE_ASSISTANT = sys.intern("assistant")
+MESSAGE_TYPE_SYSTEM = sys.intern("system")
 
 # API endpoints
 API_PREFIX = "/api"
@@ -1,24 +1,35 @@
 import os
-from typing import Optional
+from typing import Final, Optional
+
+# Snapshot of the process environment taken once at import time
+_ENV: Final[dict[str, str]] = dict(os.environ)
+
+_TRUE_VALUES: Final = frozenset(("true", "1", "yes", "on"))
 
 def get_env_var(key: str, default: Optional[str] = None) -> Optional[str]:
     """Get environment variable with optional default value."""
-    return os.getenv(key, default)
+    value = _ENV.get(key)
+    if value is None:
+        # Slow path: variables set after import (e.g. loaded from .env later)
+        return os.getenv(key, default)
+    return value
 
 def get_bool_env(key: str, default: bool = False) -> bool:
     """Get boolean environment variable."""
-    value = os.getenv(key, str(default)).lower()
-    return value in ("true", "1", "yes", "on")
+    value = get_env_var(key)
+    if value is None:
+        return default
+    return value.lower() in _TRUE_VALUES
 
 def get_int_env(key: str, default: int = 0) -> int:
     """Get integer environment variable."""
     try:
-        return int(os.getenv(key, str(default)))
+        return int(get_env_var(key, str(default)))
     except ValueError:
         return default
 
 # Environment variables
-ENV = get_env_var("ENV", "development")
-DEBUG = get_bool_env("DEBUG", ENV == "development")
-PORT = get_int_env("PORT", 8080)
-HOST = get_env_var("HOST", "0.0.0.0")
\ No newline at end of file
+ENV: Final = get_env_var("ENV", "development")
+DEBUG: Final = get_bool_env("DEBUG", ENV == "development")
+PORT: Final = get_int_env("PORT", 8080)
+HOST: Final = get_env_var("HOST", "0.0.0.0")
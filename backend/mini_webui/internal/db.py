@@ -1,20 +1,43 @@
 import os
 import json
+import hashlib
 import logging
 from contextlib import contextmanager
+from functools import lru_cache
 from typing import Any, Optional
 
-from sqlalchemy import create_engine, MetaData, event, types
+from sqlalchemy import BigInteger, create_engine, MetaData, event, literal, text, types
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.sql.type_api import _T
 from typing_extensions import Self
 
-from ..config import DATABASE_URL
+from ..config import DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_SIZE
 from sqlalchemy.engine import make_url
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
 log = logging.getLogger(__name__)
 
+try:
+    import orjson
+
+    def _json_dumps(value: Any) -> str:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - optional speedup
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
 
 class JSONField(types.TypeDecorator):
     """JSON field type for SQLAlchemy"""
@@ -23,49 +46,183 @@ class JSONField(types.TypeDecorator):
 
     def process_bind_param(self, value: Optional[_T], dialect) -> Any:
         if value is not None:
-            return json.dumps(value)
+            return _json_dumps(value)
         return value
 
     def process_result_value(self, value: Optional[_T], dialect) -> Any:
         if value is not None:
-            return json.loads(value)
+            return _json_loads(value)
         return value
 
     def copy(self, **kw: Any) -> Self:
         return JSONField(self.impl.length)
 
 
+class json_last_value(FunctionElement):
+    """``key`` of the last element of the JSON array in a JSONField column, in SQL.
+
+    Lets queries read e.g. the last transcript entry's content without loading
+    and decoding the whole document in Python.
+    """
+    type = types.Text()
+    inherit_cache = True
+
+    def __init__(self, column, key: str):
+        super().__init__(column, literal(key, types.Text()))
+
+
+@compiles(json_last_value)
+def _json_last_value_default(element, compiler, **kw):
+    column, key = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"(CAST({column} AS JSONB) -> -1 ->> {key})"
+
+
+@compiles(json_last_value, "sqlite")
+def _json_last_value_sqlite(element, compiler, **kw):
+    column, key = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"json_extract({column}, '$[#-1].' || {key})"
+
+
+class json_append(FunctionElement):
+    """Append ``value`` to the JSON array stored in a JSONField column, in SQL.
+
+    Only the new element is serialized and sent to the database; the stored
+    document is never loaded or re-encoded in Python. ``value`` may also be a
+    ``bindparam(..., type_=JSONField())`` so the statement can be built once.
+    """
+    type = JSONField()
+    inherit_cache = True
+
+    def __init__(self, column, value: Any):
+        if not isinstance(value, ClauseElement):
+            value = literal(_json_dumps(value), types.Text())
+        super().__init__(column, value)
+
+
+@compiles(json_append)
+def _json_append_default(element, compiler, **kw):
+    column, value = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"CAST(CAST({column} AS JSONB) || jsonb_build_array(CAST({value} AS JSONB)) AS TEXT)"
+
+
+@compiles(json_append, "sqlite")
+def _json_append_sqlite(element, compiler, **kw):
+    column, value = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"json_insert({column}, '$[#]', json({value}))"
+
+
+class epoch_now(FunctionElement):
+    """Current UNIX time (seconds) computed by the database.
+
+    Used as server_default/onupdate for timestamp columns so inserts and
+    updates don't need a Python callback per row.
+    """
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(epoch_now)
+def _epoch_now_default(element, compiler, **kw):
+    return "CAST(EXTRACT(EPOCH FROM CURRENT_TIMESTAMP) AS BIGINT)"
+
+
+@compiles(epoch_now, "sqlite")
+def _epoch_now_sqlite(element, compiler, **kw):
+    return "CAST(strftime('%s', 'now') AS INTEGER)"
+
+
 # SQLite database configuration
 SQLALCHEMY_DATABASE_URL = DATABASE_URL
+SCHEMA_LOCK_PATH: Optional[str] = None
+
+# Applied once per new SQLite connection in a single round-trip
+SQLITE_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA foreign_keys=ON;
+PRAGMA busy_timeout=5000;
+PRAGMA cache_size=-20000;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+"""
+
+# Read-only connections cannot change the journal mode; WAL is set by the writer
+SQLITE_READ_PRAGMAS = """
+PRAGMA query_only=ON;
+PRAGMA busy_timeout=5000;
+PRAGMA cache_size=-20000;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+"""
+
+# Compiled-SQL cache entries per engine (SQLAlchemy default: 500); every hot
+# statement shape is hoisted to module level, so this just leaves headroom
+QUERY_CACHE_SIZE = 1200
+
+# Streams hold no connection while generating, so the pool only has to cover
+# the short read/persist windows; pre-ping drops connections the server closed
+SERVER_POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
 
 if "sqlite" in SQLALCHEMY_DATABASE_URL:
+    read_url = None
     # Ensure parent directory exists for SQLite file paths
     try:
         url = make_url(SQLALCHEMY_DATABASE_URL)
         db_path = url.database or ""
         # Ignore in-memory or special SQLite URLs
-        if db_path and db_path not in (":memory:",):
+        if db_path and db_path not in (":memory:",) and not db_path.startswith("file:"):
             parent_dir = os.path.dirname(db_path)
             if parent_dir and not os.path.exists(parent_dir):
                 os.makedirs(parent_dir, exist_ok=True)
+            SCHEMA_LOCK_PATH = f"{db_path}.schema.lock"
+            # WAL allows any number of readers next to the single writer
+            read_url = url.set(
+                database=f"file:{os.path.abspath(db_path)}",
+                query={"mode": "ro", "uri": "true"},
+            )
     except Exception as e:
         log.warning(f"Could not ensure SQLite directory exists: {e}")
 
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL, 
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False},
+        query_cache_size=QUERY_CACHE_SIZE,
     )
 
     def on_connect(dbapi_connection, connection_record):
-        """Enable WAL mode for better concurrency"""
+        """Enable WAL mode and tune SQLite for many small reads/writes"""
         cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.executescript(SQLITE_PRAGMAS)
         cursor.close()
 
     event.listen(engine, "connect", on_connect)
+
+    if read_url is not None:
+        read_engine = create_engine(
+            read_url,
+            connect_args={"check_same_thread": False},
+            pool_size=os.cpu_count() or 4,
+            max_overflow=4,
+            query_cache_size=QUERY_CACHE_SIZE,
+        )
+
+        def on_read_connect(dbapi_connection, connection_record):
+            """Tune read-only SQLite connections"""
+            cursor = dbapi_connection.cursor()
+            cursor.executescript(SQLITE_READ_PRAGMAS)
+            cursor.close()
+
+        event.listen(read_engine, "connect", on_read_connect)
+    else:
+        read_engine = engine
 else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, query_cache_size=QUERY_CACHE_SIZE, **SERVER_POOL_OPTIONS)
+    read_engine = engine
 
 
 SessionLocal = sessionmaker(
@@ -75,12 +232,18 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+ReadSession = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
-Session = scoped_session(SessionLocal)
 
 
 def get_session():
-    """Get database session"""
+    """Get a request-scoped database session (FastAPI dependency)"""
     db = SessionLocal()
     try:
         yield db
@@ -88,9 +251,140 @@ def get_session():
         db.close()
 
 
+def get_read_session():
+    """Get read-only database session (concurrent WAL readers on SQLite)"""
+    db = ReadSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 get_db = contextmanager(get_session)
+get_read_db = contextmanager(get_read_session)
+
+
+def get_write_session():
+    """Write session that takes the SQLite write lock up front (FastAPI dependency).
+
+    For endpoints that read and then write: BEGIN IMMEDIATE avoids the deferred
+    read->write upgrade that fails with SQLITE_BUSY under concurrency. Commits
+    on success (a no-op if the endpoint already committed), rolls back on error.
+    """
+    db = SessionLocal()
+    try:
+        if engine.dialect.name == "sqlite":
+            db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# Async stack for async routes; the sync engine above stays for Alembic/scripts
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def _on_async_sqlite_connect(dbapi_connection, connection_record):
+    """Apply the SQLite PRAGMAs on aiosqlite connections"""
+    cursor = dbapi_connection.cursor()
+    for statement in SQLITE_PRAGMAS.split(";"):
+        if statement.strip():
+            cursor.execute(statement)
+    cursor.close()
+
+
+@lru_cache(maxsize=1)
+def get_async_engine() -> AsyncEngine:
+    """Async engine, created on first use so the async driver stays optional"""
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    if url.get_backend_name() == "sqlite":
+        options = {}
+        if url.database and url.database != ":memory:":
+            # aiosqlite defaults to NullPool: a new connection plus the PRAGMA
+            # script on every per-request user lookup. Keep WAL readers pooled.
+            options = dict(poolclass=AsyncAdaptedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+        async_engine = create_async_engine(url, query_cache_size=QUERY_CACHE_SIZE, **options)
+        event.listen(async_engine.sync_engine, "connect", _on_async_sqlite_connect)
+    else:
+        async_engine = create_async_engine(url, query_cache_size=QUERY_CACHE_SIZE, **SERVER_POOL_OPTIONS)
+    return async_engine
+
+
+@lru_cache(maxsize=1)
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+async def get_async_session():
+    """Get a request-scoped AsyncSession (FastAPI dependency)"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+SCHEMA_VERSION_TABLE = "_schema_version"
+
+
+def _schema_checksum() -> str:
+    """Stable fingerprint of the ORM schema (tables, columns, indexes)."""
+    spec = sorted(
+        (
+            table.name,
+            tuple((c.name, repr(c.type), c.nullable, c.primary_key) for c in table.columns),
+            tuple(sorted(index.name for index in table.indexes)),
+        )
+        for table in Base.metadata.tables.values()
+    )
+    return hashlib.sha1(repr(spec).encode()).hexdigest()
+
+
+def _stored_schema_checksum() -> Optional[str]:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text(f"SELECT checksum FROM {SCHEMA_VERSION_TABLE}")).scalar()
+    except Exception:
+        # Table missing on a fresh database
+        return None
+
+
+@contextmanager
+def _schema_lock():
+    """Serialize schema creation across workers booting at the same time."""
+    if SCHEMA_LOCK_PATH is None or fcntl is None:
+        yield
+        return
+    with open(SCHEMA_LOCK_PATH, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Initialize database tables (skipped when the schema is unchanged)"""
+    checksum = _schema_checksum()
+    if _stored_schema_checksum() == checksum:
+        return
+    with _schema_lock():
+        # Another worker may have created the schema while we waited
+        if _stored_schema_checksum() == checksum:
+            return
+        log.info("Schema changed or missing, running create_all")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (checksum TEXT NOT NULL)"))
+            conn.execute(text(f"DELETE FROM {SCHEMA_VERSION_TABLE}"))
+            conn.execute(
+                text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (checksum) VALUES (:checksum)"),
+                {"checksum": checksum},
+            )
@@ -1,23 +1,32 @@
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
 import os
 
-from .config import FRONTEND_BUILD_DIR
+from .config import FRONTEND_BUILD_DIR, RAG_ENABLED
 from .internal.db import init_db
+from .utils.openai import close_http_client, get_http_client
 from . import models  # Import models to register them with Base
 from .routers.auths import router as auth_router
 from .routers.openai_api import router as openai_router
-from .routers.chats import router as chats_router
+from .routers.chats import drain_background_tasks, router as chats_router
 from .routers.admin import router as admin_router
 from .routers.rag import router as rag_router
 
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:  # pragma: no cover - optional speedup
+    from fastapi.responses import JSONResponse as DefaultResponse
+
 app = FastAPI(
     title="mini-webui",
     description="delivers a streamlined AI chat console for teams that need rapid iteration, reliable integrations, and production-ready guardrails",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=DefaultResponse,
 )
 
 # Basic logging configuration (console)
@@ -29,8 +38,22 @@ logger = logging.getLogger("mini_webui")
 async def startup_event():
     logger.info("Starting up: initializing database")
     init_db()
+    get_http_client()
+    if RAG_ENABLED:
+        from .rag import get_rag_service
+
+        # Index and embedding model load off the event loop, before traffic
+        logger.info("Loading RAG index")
+        await run_in_threadpool(get_rag_service)
     logger.info("Startup complete")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Let streamed replies still being written reach the database
+    await drain_background_tasks()
+    await close_http_client()
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -58,25 +81,49 @@ app.include_router(admin_router)
 app.include_router(rag_router)
 
 # Serve static files and SPA
+class ImmutableStaticFiles(StaticFiles):
+    """Static files with content-hashed names that can be cached forever."""
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+class SPAStaticFiles(StaticFiles):
+    """Serves the built SPA; unknown paths fall back to index.html.
+
+    Starlette handles ETag/Last-Modified revalidation (304) natively.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            response = await super().get_response(path, scope)
+        except StarletteHTTPException as exc:
+            if exc.status_code != 404:
+                raise
+            response = None
+        if response is None or response.status_code == 404:
+            # Client-side routes (e.g. /admin) are resolved by the SPA
+            return await super().get_response("index.html", scope)
+        return response
+
+    def file_response(self, full_path, *args, **kwargs) -> Response:
+        response = super().file_response(full_path, *args, **kwargs)
+        if os.path.basename(full_path) == "index.html":
+            # SPA shell must always revalidate so new builds are picked up
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
 if os.path.exists(FRONTEND_BUILD_DIR):
-    # Mount SvelteKit's _app directory for assets
+    # Mount SvelteKit's _app directory for assets (filenames are content-hashed)
     app_dir = os.path.join(FRONTEND_BUILD_DIR, "_app")
     if os.path.exists(app_dir):
-        app.mount("/_app", StaticFiles(directory=app_dir), name="app-assets")
-    
-    # Serve other static files (favicon, etc.)
-    @app.get("/{path:path}")
-    async def serve_spa(path: str):
-        # Handle root path
-        if path == "":
-            return FileResponse(os.path.join(FRONTEND_BUILD_DIR, "index.html"))
-        
-        file_path = os.path.join(FRONTEND_BUILD_DIR, path)
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            return FileResponse(file_path)
-        
-        # For all other paths, serve the SPA
-        return FileResponse(os.path.join(FRONTEND_BUILD_DIR, "index.html"))
+        app.mount("/_app", ImmutableStaticFiles(directory=app_dir), name="app-assets")
+
+    # Everything else (index, favicon, SPA routes); mounted last so API routes win
+    app.mount("/", SPAStaticFiles(directory=FRONTEND_BUILD_DIR, html=True), name="spa")
 
 if __name__ == "__main__":
     import uvicorn
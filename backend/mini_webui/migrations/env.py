@@ -11,7 +11,7 @@ from alembic import context
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
 # Import your models here
-from backend.mini_webui.internal.db import Base
+from backend.mini_webui.internal.db import Base, SCHEMA_VERSION_TABLE
 from backend.mini_webui.models.users import User
 from backend.mini_webui.models.chats import Chat
 from backend.mini_webui.models.messages import Message
@@ -30,6 +30,11 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # init_db's schema checksum table is not part of the ORM metadata
+    return not (type_ == "table" and name == SCHEMA_VERSION_TABLE)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -52,6 +57,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -75,7 +81,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
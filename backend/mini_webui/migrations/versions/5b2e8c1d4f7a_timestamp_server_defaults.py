@@ -0,0 +1,33 @@
+"""Compute created_at/updated_at defaults in the database
+
+Revision ID: 5b2e8c1d4f7a
+Revises: 0c41e4012ba3
+Create Date: 2026-10-15 09:12:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from mini_webui.internal.db import epoch_now
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8c1d4f7a'
+down_revision = '0c41e4012ba3'
+branch_labels = None
+depends_on = None
+
+TABLES = ('user', 'chat', 'message', 'setting')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.BigInteger(), server_default=epoch_now())
+            batch_op.alter_column('updated_at', existing_type=sa.BigInteger(), server_default=epoch_now())
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.BigInteger(), server_default=None)
+            batch_op.alter_column('updated_at', existing_type=sa.BigInteger(), server_default=None)
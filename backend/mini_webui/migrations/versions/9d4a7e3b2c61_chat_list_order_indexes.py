@@ -0,0 +1,28 @@
+"""Index chat list ordering by updated_at per user
+
+Revision ID: 9d4a7e3b2c61
+Revises: 5b2e8c1d4f7a
+Create Date: 2026-10-15 10:03:17.554920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4a7e3b2c61'
+down_revision = '5b2e8c1d4f7a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('user_id_archived_idx', table_name='chat')
+    op.create_index('user_id_updated_at_idx', 'chat', ['user_id', sa.text('updated_at DESC')], unique=False)
+    op.create_index('user_id_archived_updated_idx', 'chat', ['user_id', 'archived', sa.text('updated_at DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('user_id_archived_updated_idx', table_name='chat')
+    op.drop_index('user_id_updated_at_idx', table_name='chat')
+    op.create_index('user_id_archived_idx', 'chat', ['user_id', 'archived'], unique=False)
@@ -4,7 +4,7 @@ from typing import Optional
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, ForeignKey, Index
 
-from ..internal.db import Base, JSONField
+from ..internal.db import Base, JSONField, epoch_now
 
 
 ####################
@@ -19,7 +19,8 @@ class Chat(Base):
     user_id = Column(String, ForeignKey("user.id"), nullable=False)
     title = Column(Text, nullable=False)
     
-    # Chat messages stored as JSON
+    # Chat messages stored as JSON. Grows with the conversation: list and
+    # ownership queries should use load_only(...) or project columns instead.
     chat = Column(JSONField, nullable=False, default=lambda: [])
     
     # Chat metadata
@@ -33,13 +34,15 @@ class Chat(Base):
     share_id = Column(String, unique=True, nullable=True)
     
     # Timestamps
-    created_at = Column(BigInteger, default=lambda: int(time.time()))
-    updated_at = Column(BigInteger, default=lambda: int(time.time()), onupdate=lambda: int(time.time()))
+    created_at = Column(BigInteger, server_default=epoch_now())
+    updated_at = Column(BigInteger, server_default=epoch_now(), onupdate=epoch_now())
 
     # Performance indexes
     __table_args__ = (
         Index("user_id_idx", "user_id"),
-        Index("user_id_archived_idx", "user_id", "archived"),
+        # Chat list: WHERE user_id = ? [AND archived = ?] ORDER BY updated_at DESC
+        Index("user_id_updated_at_idx", "user_id", updated_at.desc()),
+        Index("user_id_archived_updated_idx", "user_id", "archived", updated_at.desc()),
         Index("user_id_pinned_idx", "user_id", "pinned"),
         Index("updated_at_idx", "updated_at"),
     )
@@ -52,7 +55,7 @@ class Chat(Base):
 
 class ChatModel(BaseModel):
     """Chat response model"""
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
     id: str
     user_id: str
@@ -98,12 +101,13 @@ class ChatMessage(BaseModel):
 
 class ChatResponse(BaseModel):
     """Chat response without sensitive data"""
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
     
     id: str
     title: str
     archived: bool
     pinned: bool
     share_id: Optional[str] = None
+    last_message: Optional[str] = None
     created_at: int
     updated_at: int
\ No newline at end of file
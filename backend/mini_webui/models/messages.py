@@ -1,10 +1,11 @@
-import time
+import sys
 from typing import Optional
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, ForeignKey, Index
+from sqlalchemy.orm import validates
 
-from ..internal.db import Base, JSONField
+from ..internal.db import Base, JSONField, epoch_now
 
 
 ####################
@@ -27,8 +28,8 @@ class Message(Base):
     meta = Column(JSONField, nullable=True)
     
     # Timestamps
-    created_at = Column(BigInteger, default=lambda: int(time.time()))
-    updated_at = Column(BigInteger, default=lambda: int(time.time()), onupdate=lambda: int(time.time()))
+    created_at = Column(BigInteger, server_default=epoch_now())
+    updated_at = Column(BigInteger, server_default=epoch_now(), onupdate=epoch_now())
 
     # Performance indexes
     __table_args__ = (
@@ -36,6 +37,10 @@ class Message(Base):
         Index("chat_id_created_at_idx", "chat_id", "created_at"),
     )
 
+    @validates("role")
+    def _intern_role(self, key, value):
+        return sys.intern(value) if value else value
+
 
 ####################
 # Pydantic Models
@@ -44,7 +49,7 @@ class Message(Base):
 
 class MessageModel(BaseModel):
     """Message response model"""
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
     id: str
     chat_id: str
@@ -75,7 +80,7 @@ class MessageUpdate(BaseModel):
 
 class MessageResponse(BaseModel):
     """Message response model"""
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
     
     id: str
     role: str
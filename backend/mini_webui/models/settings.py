@@ -1,10 +1,9 @@
-import time
 from typing import Optional, Any
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text
 
-from ..internal.db import Base
+from ..internal.db import Base, epoch_now
 
 
 ####################
@@ -24,8 +23,8 @@ class Setting(Base):
     category = Column(String, nullable=True)
     
     # Timestamps
-    created_at = Column(BigInteger, default=lambda: int(time.time()))
-    updated_at = Column(BigInteger, default=lambda: int(time.time()), onupdate=lambda: int(time.time()))
+    created_at = Column(BigInteger, server_default=epoch_now())
+    updated_at = Column(BigInteger, server_default=epoch_now(), onupdate=epoch_now())
 
 
 ####################
@@ -35,7 +34,7 @@ class Setting(Base):
 
 class SettingModel(BaseModel):
     """Setting response model"""
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
     id: str
     key: str
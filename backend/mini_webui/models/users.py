@@ -1,11 +1,12 @@
-import time
+import sys
 from typing import Optional
 from datetime import datetime
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, Boolean
+from sqlalchemy.orm import validates
 
-from ..internal.db import Base, JSONField
+from ..internal.db import Base, JSONField, epoch_now
 
 
 ####################
@@ -36,8 +37,12 @@ class User(Base):
     last_active_at = Column(BigInteger, nullable=True)
     
     # Timestamps
-    created_at = Column(BigInteger, default=lambda: int(time.time()))
-    updated_at = Column(BigInteger, default=lambda: int(time.time()), onupdate=lambda: int(time.time()))
+    created_at = Column(BigInteger, server_default=epoch_now())
+    updated_at = Column(BigInteger, server_default=epoch_now(), onupdate=epoch_now())
+
+    @validates("role")
+    def _intern_role(self, key, value):
+        return sys.intern(value) if value else value
 
 
 ####################
@@ -53,7 +58,7 @@ class UserSettings(BaseModel):
 
 class UserModel(BaseModel):
     """User response model"""
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
     
     id: str
     name: str
@@ -99,7 +104,7 @@ class UserLogin(BaseModel):
 
 class UserResponse(BaseModel):
     """User response without sensitive data"""
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
     
     id: str
     name: str
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+log = logging.getLogger("mini_webui.rag.embeddings")
+
+
+class CachedEmbeddings(Embeddings):
+    """Caches query embeddings in an in-process LRU backed by an on-disk SQLite table.
+
+    Repeated questions skip the embedding API round-trip. Document embeddings
+    are passed straight through to the wrapped backend.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        *,
+        capacity: int = 10_000,
+        cache_path: Optional[Path] = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.capacity = capacity
+        self.cache_path = cache_path
+        self._lru: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def preload(self) -> None:
+        """Load the wrapped backend's model now (local backends only)."""
+        preload = getattr(self.embeddings, "preload", None)
+        if preload is not None:
+            preload()
+
+    def embed_query(self, text: str) -> np.ndarray:
+        # Returned as a read-only C-contiguous float32 array: FAISS consumes it
+        # without rebuilding it from a list of Python floats.
+        key = hashlib.sha256((self.model + "\0" + text).encode("utf-8")).digest()
+        vector = self._get(key)
+        if vector is None:
+            vector = np.ascontiguousarray(self.embeddings.embed_query(text), dtype=np.float32)
+            vector.setflags(write=False)
+            self._put(key, vector)
+        return vector
+
+    # ===== cache layers =====
+    def _get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                return vector
+            db = self._connect()
+            if db is None:
+                return None
+            row = db.execute("SELECT vec FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            vector = np.frombuffer(row[0], dtype=np.float32)
+            self._remember(key, vector)
+            return vector
+
+    def _put(self, key: bytes, vector: np.ndarray) -> None:
+        with self._lock:
+            self._remember(key, vector)
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO embedding_cache (key, vec) VALUES (?, ?)",
+                    (key, vector.tobytes()),
+                )
+                db.commit()
+            except sqlite3.Error:
+                log.warning("Could not persist query embedding", exc_info=True)
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._db is not None or self.cache_path is None:
+            return self._db
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS embedding_cache (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+            db.commit()
+        except sqlite3.Error:
+            log.warning("Embedding cache at %s unavailable; using memory only", self.cache_path, exc_info=True)
+            self.cache_path = None
+            return None
+        self._db = db
+        return db
+
+
+class LocalSTEmbeddings(Embeddings):
+    """Runs a sentence-transformers model on the CPU; loaded on first use."""
+
+    def __init__(self, model: str, *, batch_size: int = 64) -> None:
+        self.model_name = model
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as exc:
+                    raise RuntimeError(
+                        "RAG_EMBEDDING_BACKEND=st requires the 'sentence-transformers' package"
+                    ) from exc
+                log.info("Loading sentence-transformers model %s", self.model_name)
+                self._model = SentenceTransformer(self.model_name, device="cpu")
+            return self._model
+
+    def preload(self) -> None:
+        self.model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return vectors.astype(np.float32, copy=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+class LocalONNXEmbeddings(LocalSTEmbeddings):
+    """Runs the model through ONNX Runtime with full graph optimizations.
+
+    Sentence vectors are mean-pooled over the attention mask and L2-normalized,
+    matching the sentence-transformers backend.
+    """
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    import onnxruntime as ort
+                    from optimum.onnxruntime import ORTModelForFeatureExtraction
+                    from transformers import AutoTokenizer
+                except ImportError as exc:
+                    raise RuntimeError(
+                        "RAG_EMBEDDING_BACKEND=onnx requires 'optimum[onnxruntime]'"
+                    ) from exc
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+                log.info("Loading ONNX embedding model %s", self.model_name)
+                tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                model = ORTModelForFeatureExtraction.from_pretrained(
+                    self.model_name,
+                    export=True,
+                    provider="CPUExecutionProvider",
+                    session_options=options,
+                )
+                self._model = (tokenizer, model)
+            return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        tokenizer, model = self.model
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = tokenizer(
+                texts[start : start + self.batch_size],
+                padding=True,
+                truncation=True,
+                return_tensors="np",
+            )
+            hidden = np.asarray(model(**inputs).last_hidden_state, dtype=np.float32)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled)
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(batches)
+
+
+@lru_cache(maxsize=None)
+def build_embeddings(backend: str, model: str, api_key: str) -> Embeddings:
+    """Return the process-wide embeddings client for ``backend``/``model``.
+
+    Cached so every VectorStoreManager shares one HTTP connection pool (or one
+    loaded local model) instead of building its own.
+    """
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(model=model, api_key=api_key)
+    if backend == "st":
+        return LocalSTEmbeddings(model)
+    if backend == "onnx":
+        return LocalONNXEmbeddings(model)
+    raise ValueError(f"Unknown RAG embedding backend: {backend!r}")
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+import io
 import logging
+from functools import cached_property
 from typing import Any, Dict, List
 
 from langchain.schema import Document
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
 
 from ..config import (
@@ -22,6 +26,17 @@ from .types import RagConfig, RagDocument, RagResult, RagState
 
 log = logging.getLogger("mini_webui.rag.graph")
 
+PROMPT_TEMPLATE = (
+    "以下のコンテキストを参考に、質問に対して日本語で正確かつ簡潔に回答してください。"
+    "\n\n"
+    "質問: {query}\n"
+    "\nコンテキスト:\n{context}"
+    "\n\n回答する際の条件:\n"
+    "- 回答は日本語で書くこと\n"
+    "- コンテキストに基づいて事実のみを述べること\n"
+    "- 不明な場合はその旨を伝えること"
+)
+
 
 class RagGraphBuilder:
     """Builds a LangGraph state machine for retrieval-augmented responses."""
@@ -38,7 +53,12 @@ class RagGraphBuilder:
         self.default_language = default_language
         self.default_top_k = default_top_k
         self.system_prompt = system_prompt
-        self.llm = ChatOpenAI(
+        self._system_message = SystemMessage(content=system_prompt)
+
+    @cached_property
+    def llm(self) -> ChatOpenAI:
+        # Built on first generation rather than at service construction
+        return ChatOpenAI(
             api_key=OPENAI_API_KEY,
             base_url=OPENAI_API_BASE,
             model=RAG_COMPLETION_MODEL,
@@ -48,8 +68,10 @@ class RagGraphBuilder:
 
     def build(self):
         graph = StateGraph(RagState)
-        graph.add_node("retrieve", self._retrieve)
-        graph.add_node("generate", self._generate)
+        # Each node has a sync and an async body: invoke/stream use the former,
+        # ainvoke the latter without parking a worker thread on the LLM call
+        graph.add_node("retrieve", RunnableLambda(self._retrieve, afunc=self._aretrieve, name="retrieve"))
+        graph.add_node("generate", RunnableLambda(self._generate, afunc=self._agenerate, name="generate"))
 
         graph.set_entry_point("retrieve")
         graph.add_edge("retrieve", "generate")
@@ -81,22 +103,33 @@ class RagGraphBuilder:
         documents: List[RagDocument] = []
         for doc, score in results:
             documents.append(self._convert_document(doc, score))
-        traces = list(state.get("traces", []))
-        traces.append({
-            "step": "retrieve",
-            "top_k": top_k,
-            "documents": documents,
-            "filter": metadata_filter,
-        })
-        new_state: RagState = {
-            **state,
+        update: RagState = {
             "documents": documents,
             "language": self._get_language(state),
-            "traces": traces,
+            "traces": [{
+                "step": "retrieve",
+                "top_k": top_k,
+                "documents": documents,
+                "filter": metadata_filter,
+            }],
         }
-        return new_state
+        return update
+
+    async def _aretrieve(self, state: RagState) -> RagState:
+        # Query embedding and FAISS search block; keep them off the event loop
+        return await asyncio.to_thread(self._retrieve, state)
 
     def _generate(self, state: RagState) -> RagState:
+        messages, temperature = self._generation_input(state)
+        answer_message = self.llm.invoke(messages, temperature=temperature)
+        return self._generation_update(answer_message, temperature)
+
+    async def _agenerate(self, state: RagState) -> RagState:
+        messages, temperature = self._generation_input(state)
+        answer_message = await self.llm.ainvoke(messages, temperature=temperature)
+        return self._generation_update(answer_message, temperature)
+
+    def _generation_input(self, state: RagState) -> tuple[List[BaseMessage], float]:
         query = state["query"]
         documents = state.get("documents", [])
         context = self._build_context(documents)
@@ -107,23 +140,25 @@ class RagGraphBuilder:
 
         prompt = self._build_prompt(query, context, language)
         log.debug("Generating answer using model=%s lang=%s", RAG_COMPLETION_MODEL, language)
-        answer_message = self.llm.invoke(
-            [SystemMessage(content=system_prompt), HumanMessage(content=prompt)],
-            temperature=temperature,
+        system_message = (
+            self._system_message
+            if system_prompt == self.system_prompt
+            else SystemMessage(content=system_prompt)
         )
+        return [system_message, HumanMessage(content=prompt)], temperature
+
+    @staticmethod
+    def _generation_update(answer_message: BaseMessage, temperature: float) -> RagState:
         answer = answer_message.content if answer_message else ""
-        traces = list(state.get("traces", []))
-        traces.append({
-            "step": "generate",
-            "model": RAG_COMPLETION_MODEL,
-            "temperature": temperature,
-        })
-        new_state: RagState = {
-            **state,
+        update: RagState = {
             "answer": answer,
-            "traces": traces,
+            "traces": [{
+                "step": "generate",
+                "model": RAG_COMPLETION_MODEL,
+                "temperature": temperature,
+            }],
         }
-        return new_state
+        return update
 
     # ===== helpers =====
     @staticmethod
@@ -141,25 +176,19 @@ class RagGraphBuilder:
     def _build_context(documents: List[RagDocument]) -> str:
         if not documents:
             return "(関連するコンテキストは見つかりませんでした。)"
-        formatted = []
+        buf = io.StringIO()
+        write = buf.write
         for idx, doc in enumerate(documents, start=1):
+            if idx > 1:
+                write("\n\n")
             source = doc.get("metadata", {}).get("source") or doc["id"]
-            formatted.append(f"【文書{idx}】(source: {source})\n{doc['page_content']}")
-        return "\n\n".join(formatted)
+            write(f"【文書{idx}】(source: {source})\n")
+            write(doc["page_content"])
+        return buf.getvalue()
 
     @staticmethod
     def _build_prompt(query: str, context: str, language: str) -> str:
-        return (
-            "以下のコンテキストを参考に、質問に対して日本語で正確かつ簡潔に回答してください。"
-            "\n\n" +
-            f"質問: {query}\n" +
-            "\nコンテキスト:\n" + context +
-            "\n\n回答する際の条件:\n"
-            "- 回答は日本語で書くこと\n"
-            "- コンテキストに基づいて事実のみを述べること\n"
-            "- 不明な場合はその旨を伝えること"
-        )
-
+        return PROMPT_TEMPLATE.format_map({"query": query, "context": context})
 
 def run_graph(store: VectorStoreManager, query: str, config: RagConfig | None = None) -> RagResult:
     builder = RagGraphBuilder(store)
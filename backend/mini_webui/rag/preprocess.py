@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import io
+import re
 from pathlib import Path
 from typing import Dict, Iterable, List, Tuple
 
 MarkdownSegment = Tuple[str, Dict[str, object]]
 
+# Header separator row such as "| --- | :---: |" (only pipes, colons, dashes, blanks)
+_ALIGN_RE = re.compile(r"^\s*\|?[\s:\-|]*\|?\s*$")
+
 
 def _parse_cells(line: str) -> List[str]:
     body = line.strip().strip("|")
@@ -12,16 +17,7 @@ def _parse_cells(line: str) -> List[str]:
 
 
 def _is_alignment_row(line: str) -> bool:
-    stripped = (
-        line.strip()
-        .strip("|")
-        .replace("|", "")
-        .replace(":", "")
-        .replace("-", "")
-        .replace(" ", "")
-        .replace("\t", "")
-    )
-    return stripped == ""
+    return _ALIGN_RE.match(line) is not None
 
 
 def preprocess_markdown_tables(text: str, source: str) -> List[MarkdownSegment]:
@@ -30,7 +26,9 @@ def preprocess_markdown_tables(text: str, source: str) -> List[MarkdownSegment]:
     Returns a list of (text, metadata) pairs ready for downstream chunking.
     """
     lines = text.splitlines()
+    line_count = len(lines)
     segments: List[MarkdownSegment] = []
+    append_segment = segments.append
     buffer: List[str] = []
     current_heading: str | None = None
     path_stem = Path(source).stem
@@ -43,11 +41,11 @@ def preprocess_markdown_tables(text: str, source: str) -> List[MarkdownSegment]:
             meta: Dict[str, object] = {"source": source}
             if current_heading:
                 meta["heading"] = current_heading
-            segments.append((block, meta))
+            append_segment((block, meta))
         buffer.clear()
 
     i = 0
-    while i < len(lines):
+    while i < line_count:
         line = lines[i]
         stripped = line.strip()
         if stripped.startswith("#"):
@@ -56,27 +54,27 @@ def preprocess_markdown_tables(text: str, source: str) -> List[MarkdownSegment]:
             i += 1
             continue
 
-        if "|" in line and i + 1 < len(lines) and _is_alignment_row(lines[i + 1]):
+        if "|" in line and i + 1 < line_count and _is_alignment_row(lines[i + 1]):
             flush_buffer()
             headers = [h or "列" for h in _parse_cells(line)]
             i += 2  # skip header + alignment
             row_index = 0
-            while i < len(lines) and "|" in lines[i]:
+            while i < line_count and "|" in lines[i]:
                 row_cells = _parse_cells(lines[i])
                 if row_cells and any(cell.strip() for cell in row_cells):
                     row_index += 1
                     label = current_heading or path_stem
-                    text_lines = [f"表: {label} 行 {row_index}"]
+                    row_buf = io.StringIO()
+                    row_buf.write(f"表: {label} 行 {row_index}")
                     for header, cell in zip(headers, row_cells):
-                        cell_value = cell.strip() or "(空欄)"
-                        text_lines.append(f"{header}: {cell_value}")
+                        row_buf.write(f"\n{header}: {cell.strip() or '(空欄)'}")
                     meta: Dict[str, object] = {
                         "source": source,
                         "table": label,
                         "row_index": row_index,
                         "columns": headers,
                     }
-                    segments.append(("\n".join(text_lines), meta))
+                    append_segment((row_buf.getvalue(), meta))
                 i += 1
             continue
 
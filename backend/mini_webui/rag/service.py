@@ -3,13 +3,14 @@ from __future__ import annotations
 import json
 import logging
 from pathlib import Path
-from typing import Dict, Generator, Optional
+from typing import Any, AsyncIterator, Dict, Generator, List, Optional
 
 from fastapi import HTTPException, status
 
 from ..config import (
     RAG_ALLOW_STREAMING,
     RAG_ENABLED,
+    RAG_INDEX_MMAP,
     RAG_INDEX_PATH,
     RAG_LANGUAGE,
     RAG_TOP_K,
@@ -18,6 +19,16 @@ from .graph import RagGraphBuilder
 from .store import VectorStoreManager
 from .types import RagConfig, RagResult
 
+try:
+    import orjson
+
+    def _dumps(payload: Any) -> bytes:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:  # pragma: no cover - optional speedup
+
+    def _dumps(payload: Any) -> bytes:
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
 log = logging.getLogger("mini_webui.rag.service")
 
 
@@ -41,6 +52,11 @@ class RagService:
             default_language=default_language,
         )
         self.graph = self.builder.build()
+        if self._enabled:
+            # Constructed at startup (see main.startup_event), so the first user
+            # query pays neither the index load nor a local model load
+            self.store.load(mmap=RAG_INDEX_MMAP)
+            self.store.embedding.preload()
 
     def ensure_enabled(self) -> None:
         if not self._enabled:
@@ -65,7 +81,22 @@ class RagService:
             "traces": result.get("traces", []),
         }
 
-    def stream(self, question: str, *, config: Optional[RagConfig] = None) -> Generator[Dict[str, str], None, None]:
+    async def aquery(self, question: str, *, config: Optional[RagConfig] = None) -> RagResult:
+        """Async ``query``: retrieval runs in a worker thread, generation awaits the LLM."""
+        self.ensure_enabled()
+        state = {
+            "query": question,
+            "traces": [],
+            "config": config or {},
+        }
+        result = await self.graph.ainvoke(state)
+        return {
+            "answer": result.get("answer", ""),
+            "documents": result.get("documents", []),
+            "traces": result.get("traces", []),
+        }
+
+    def stream(self, question: str, *, config: Optional[RagConfig] = None) -> Generator[Dict[str, Any], None, None]:
         self.ensure_enabled()
         if not RAG_ALLOW_STREAMING:
             # Fallback to single answer event
@@ -79,33 +110,83 @@ class RagService:
             "traces": [],
             "config": config or {},
         }
-        for event in self.graph.stream(state, stream_mode="updates"):
-            kind = str(event.get("event"))
-            data = event.get("data", {}) or {}
-            documents = data.get("documents")
-            answer = data.get("answer")
-            if documents:
-                yield self._make_event("documents", documents)
-            if answer:
-                yield self._make_event("answer", answer)
-            if kind == "graph:end":
-                final_state = data.get("state", {})
-                if final_state.get("traces"):
-                    yield self._make_event("traces", final_state["traces"])
-                break
+        progress = _StreamProgress()
+        # "updates" yields {node_name: state delta} after each node finishes
+        for update in self.graph.stream(state, stream_mode="updates"):
+            yield from progress.events(update)
+        if progress.traces:
+            yield self._make_event("traces", progress.traces)
+
+    async def astream(self, question: str, *, config: Optional[RagConfig] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async ``stream``: same events, driven by the graph's async node bodies on the event loop."""
+        self.ensure_enabled()
+        if not RAG_ALLOW_STREAMING:
+            result = await self.aquery(question, config=config)
+            yield self._make_event("answer", result["answer"])
+            yield self._make_event("documents", result["documents"])
+            yield self._make_event("traces", result["traces"])
+            return
+        state = {
+            "query": question,
+            "traces": [],
+            "config": config or {},
+        }
+        progress = _StreamProgress()
+        async for update in self.graph.astream(state, stream_mode="updates"):
+            for event in progress.events(update):
+                yield event
+        if progress.traces:
+            yield self._make_event("traces", progress.traces)
 
     @staticmethod
-    def _make_event(event: str, payload) -> Dict[str, str]:
+    def to_json(result: RagResult) -> bytes:
+        """Encode a query result as UTF-8 JSON (numpy scores included)."""
+        return _dumps(result)
+
+    @staticmethod
+    def _make_event(event: str, payload) -> Dict[str, Any]:
+        # data is UTF-8 JSON bytes; JSON escapes newlines, so it is always a single SSE line
         return {
             "event": event,
-            "data": json.dumps(payload, ensure_ascii=False),
+            "data": _dumps(payload),
         }
 
 
+class _StreamProgress:
+    """Turns graph "updates" into client events, skipping what was already sent."""
+
+    __slots__ = ("last_docs_key", "answer_len", "traces")
+
+    def __init__(self) -> None:
+        self.last_docs_key = None
+        self.answer_len = 0
+        self.traces: List[Dict[str, Any]] = []
+
+    def events(self, update: Dict[str, Any]) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for delta in update.values():
+            if not delta:
+                continue
+            self.traces.extend(delta.get("traces") or ())
+            documents = delta.get("documents")
+            if documents:
+                docs_key = tuple((doc.get("id"), doc.get("score")) for doc in documents)
+                if docs_key != self.last_docs_key:
+                    self.last_docs_key = docs_key
+                    events.append(RagService._make_event("documents", documents))
+            answer = delta.get("answer")
+            if answer and len(answer) > self.answer_len:
+                # Send only the new suffix; clients append answer events
+                events.append(RagService._make_event("answer", answer[self.answer_len:]))
+                self.answer_len = len(answer)
+        return events
+
+
 _rag_service: Optional[RagService] = None
 
 
 def get_rag_service() -> RagService:
+    """Process-wide RagService; after the first call this is a single global read."""
     global _rag_service
     if _rag_service is None:
         _rag_service = RagService()
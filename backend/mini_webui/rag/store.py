@@ -1,48 +1,178 @@
 from __future__ import annotations
 
+import io
 import json
 import logging
+import math
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
+import faiss
+import numpy as np
 from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores.faiss import FAISS
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from ..config import OPENAI_API_KEY, RAG_EMBEDDING_MODEL, RAG_LANGUAGE
+from ..config import (
+    EMBED_BATCH_SIZE,
+    EMBED_CONCURRENCY,
+    OPENAI_API_KEY,
+    RAG_EMBEDDING_BACKEND,
+    RAG_EMBEDDING_MODEL,
+    RAG_INDEX_MMAP,
+    RAG_INDEX_QUANT,
+    RAG_INDEX_TYPE,
+    RAG_LANGUAGE,
+    RAG_QUERY_CACHE_SIZE,
+    RAG_SPLITTER_BACKEND,
+)
+from .embeddings import CachedEmbeddings, build_embeddings
 from .preprocess import preprocess_markdown_tables
 
+try:
+    import orjson
+
+    def _json_dumps(value: Any, *, indent: bool = False) -> str:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(value, option=option).decode()
+
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - optional speedup
+
+    def _json_dumps(value: Any, *, indent: bool = False) -> str:
+        return json.dumps(value, ensure_ascii=False, indent=2 if indent else None)
+
+    _json_loads = json.loads
+
 log = logging.getLogger("mini_webui.rag.store")
+log.info("FAISS %s SIMD dispatch: %s", faiss.__version__, faiss.get_compile_options().strip())
+
+SPLIT_SEPARATORS = ("\n\n", "。", "？", "！", "\n")
+INGEST_EXTENSIONS = frozenset({".txt", ".md", ".markdown", ".json", ".jsonl"})
+
+# Exact search stays cheap below this many vectors; "auto" switches to HNSW past it
+FLAT_INDEX_MAX = 10_000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+IVF_TRAIN_SAMPLE = 100_000
+# k-means wants ~39 points per centroid; the PQ codebooks have 256 centroids each
+IVF_MIN_TRAIN = 39 * 256
+# Index types searched by a full scan, i.e. candidates for the auto HNSW upgrade
+_SCAN_INDEXES = (faiss.IndexFlat, faiss.IndexScalarQuantizer, faiss.IndexPQ)
+# Zero-copy mapping of flat codes needs a recent FAISS; older builds only map IVF lists
+FAISS_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # PQ needs dim % m == 0; aim for 4 dimensions per sub-quantizer
+    return next(m for m in range(max(1, dim // 4), 0, -1) if dim % m == 0)
+
+
+def _tune_index(index: faiss.Index) -> faiss.Index:
+    """Apply query-time parameters, which FAISS does not persist for every index type."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = IVF_NPROBE
+    return index
+
+
+def _train(index: faiss.Index, vectors: np.ndarray) -> faiss.Index:
+    # Quantizers are trained once on the whole first ingest, not per batch
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > IVF_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(len(vectors), IVF_TRAIN_SAMPLE, replace=False)
+            sample = vectors[rows]
+        index.train(np.ascontiguousarray(sample, dtype=np.float32))
+    return index
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str, quant: str = "none") -> faiss.Index:
+    """Create an empty (but trained) FAISS index sized for ``vectors``."""
+    count, dim = vectors.shape
+    if index_type == "auto":
+        index_type = "flat" if count < FLAT_INDEX_MAX else "hnsw"
+    if quant not in {"none", "sq8", "pq"}:
+        raise ValueError(f"Unknown RAG index quantization: {quant!r}")
+    if quant == "pq" and index_type != "ivfpq" and count < IVF_MIN_TRAIN:
+        log.warning("Too few vectors (%d) to train PQ codebooks; storing float32 vectors", count)
+        quant = "none"
+    if index_type == "hnsw":
+        if quant == "sq8":
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M)
+        elif quant == "pq":
+            index = faiss.IndexHNSWPQ(dim, _pq_subquantizers(dim), HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return _tune_index(_train(index, vectors))
+    if index_type == "ivfpq":
+        nlist = max(1, int(math.sqrt(count)))
+        if count < IVF_MIN_TRAIN:
+            log.warning("Too few vectors (%d) to train IVF-PQ; using a flat index", count)
+            return faiss.IndexFlatL2(dim)
+        index = faiss.index_factory(dim, f"IVF{nlist},PQ{_pq_subquantizers(dim)}")
+        return _tune_index(_train(index, vectors))
+    if index_type != "flat":
+        raise ValueError(f"Unknown RAG index type: {index_type!r}")
+    if quant == "sq8":
+        return _train(faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit), vectors)
+    if quant == "pq":
+        return _train(faiss.IndexPQ(dim, _pq_subquantizers(dim), 8), vectors)
+    return faiss.IndexFlatL2(dim)
 
 
 @dataclass
 class VectorStoreManager:
     index_path: Path
     embedding_model: str = RAG_EMBEDDING_MODEL
+    embedding_backend: str = RAG_EMBEDDING_BACKEND
+    splitter_backend: str = RAG_SPLITTER_BACKEND
+    index_type: str = RAG_INDEX_TYPE
+    index_quant: str = RAG_INDEX_QUANT
     language: str = RAG_LANGUAGE
     chunk_size: int = 1024
     chunk_overlap: int = 128
 
     _vectorstore: Optional[FAISS] = None
+    _mmapped: bool = False
+
+    @cached_property
+    def embedding(self) -> CachedEmbeddings:
+        # Built once per manager; repeated queries are served from the cache
+        return CachedEmbeddings(
+            build_embeddings(self.embedding_backend, self.embedding_model, OPENAI_API_KEY),
+            f"{self.embedding_backend}:{self.embedding_model}",
+            capacity=RAG_QUERY_CACHE_SIZE,
+            cache_path=self.index_path / "emb_cache.sqlite",
+        )
 
-    @property
-    def embedding(self) -> OpenAIEmbeddings:
-        return OpenAIEmbeddings(model=self.embedding_model, api_key=OPENAI_API_KEY)
+    def load(self, *, mmap: bool = False) -> Optional[FAISS]:
+        """Load the index from disk once.
 
-    def load(self) -> Optional[FAISS]:
-        if self._vectorstore is not None:
+        ``mmap=True`` maps the vectors read-only so several workers share one copy
+        in the page cache; such an index cannot grow, so writers reload it.
+        """
+        if self._vectorstore is not None and (mmap or not self._mmapped):
             return self._vectorstore
         faiss_index = self.index_path / "index.faiss"
         docstore_path = self.index_path / "index.pkl"
         if faiss_index.exists() and docstore_path.exists():
-            log.info("Loading FAISS index from %s", self.index_path)
-            self._vectorstore = FAISS.load_local(
-                str(self.index_path),
-                self.embedding,
-                allow_dangerous_deserialization=True,
-            )
+            log.info("Loading FAISS index from %s%s", self.index_path, " (mmap)" if mmap else "")
+            index = faiss.read_index(str(faiss_index), FAISS_MMAP_FLAGS if mmap else 0)
+            with docstore_path.open("rb") as fh:
+                docstore, index_to_docstore_id = pickle.load(fh)
+            self._vectorstore = FAISS(self.embedding, _tune_index(index), docstore, index_to_docstore_id)
+            self._mmapped = mmap
         return self._vectorstore
 
     def save(self) -> None:
@@ -50,10 +180,17 @@ class VectorStoreManager:
             return
         log.debug("Saving FAISS index to %s", self.index_path)
         self.index_path.mkdir(parents=True, exist_ok=True)
-        self._vectorstore.save_local(str(self.index_path))
+        # Write aside and rename: processes that mmap the old file keep a valid inode
+        faiss_tmp = self.index_path / "index.faiss.tmp"
+        docstore_tmp = self.index_path / "index.pkl.tmp"
+        faiss.write_index(self._vectorstore.index, str(faiss_tmp))
+        with docstore_tmp.open("wb") as fh:
+            pickle.dump((self._vectorstore.docstore, self._vectorstore.index_to_docstore_id), fh)
+        os.replace(faiss_tmp, self.index_path / "index.faiss")
+        os.replace(docstore_tmp, self.index_path / "index.pkl")
 
     def retriever(self, top_k: int) -> FAISS:
-        store = self.load()
+        store = self.load(mmap=RAG_INDEX_MMAP)
         if store is None:
             raise ValueError("RAG index is empty. Ingest documents before creating a retriever.")
         return store.as_retriever(search_kwargs={"k": max(1, top_k)})
@@ -65,7 +202,7 @@ class VectorStoreManager:
         *,
         metadata_filter: Optional[dict] = None,
     ) -> List[tuple[Document, float]]:
-        store = self.load()
+        store = self.load(mmap=RAG_INDEX_MMAP)
         if store is None:
             raise ValueError("RAG index is empty. Ingest documents before querying.")
         search_kwargs = {"k": max(1, top_k)}
@@ -73,61 +210,97 @@ class VectorStoreManager:
             search_kwargs["filter"] = metadata_filter
         return store.similarity_search_with_score(query, **search_kwargs)
 
+    @cached_property
+    def _splitter(self) -> RecursiveCharacterTextSplitter:
+        return RecursiveCharacterTextSplitter(
+            separators=list(SPLIT_SEPARATORS),
+            keep_separator=True,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+        )
+
+    @cached_property
+    def _native_splitter(self):
+        if self.splitter_backend != "semantic":
+            return None
+        try:
+            from semantic_text_splitter import TextSplitter
+        except ImportError:
+            log.warning("semantic-text-splitter is not installed; using the LangChain splitter")
+            return None
+        # Unicode sentence boundaries already cover 。？！ alongside blank lines
+        return TextSplitter(self.chunk_size, overlap=self.chunk_overlap)
+
     def split_text(
         self,
         text: str,
         source: str | None = None,
         metadata: Optional[Dict[str, object]] = None,
     ) -> List[Document]:
-        splitter = RecursiveCharacterTextSplitter(
-            separators=["\n\n", "。", "？", "！", "\n", "。"],
-            keep_separator=True,
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-        )
         base_meta: Dict[str, object] = {}
         if metadata:
             base_meta.update({k: v for k, v in metadata.items() if v is not None})
         if source and "source" not in base_meta:
             base_meta["source"] = source
-        chunks = splitter.create_documents([text], metadatas=[base_meta])
+        splitter = self._native_splitter
+        if splitter is not None:
+            return [Document(page_content=chunk, metadata=dict(base_meta)) for chunk in splitter.chunks(text)]
+        chunks = self._splitter.create_documents([text], metadatas=[base_meta])
         return chunks
 
     def ingest_documents(self, docs: Iterable[Document], save: bool = True) -> int:
         docs_list = list(docs)
         if not docs_list:
             return 0
+        texts = [doc.page_content for doc in docs_list]
+        metas = [doc.metadata for doc in docs_list]
+        vectors = self._embed_batches(texts)
         store = self.load()
         if store is None:
             log.info("Creating new FAISS index at %s", self.index_path)
             self.index_path.mkdir(parents=True, exist_ok=True)
-            self._vectorstore = FAISS.from_documents(docs_list, self.embedding)
-        else:
-            store.add_documents(docs_list)
-            self._vectorstore = store
+            index = build_faiss_index(vectors, self.index_type, self.index_quant)
+            store = FAISS(self.embedding, index, InMemoryDocstore(), {})
+        store.add_embeddings(zip(texts, vectors), metadatas=metas)
+        self._vectorstore = self._maybe_upgrade(store)
         if save:
             self.save()
         return len(docs_list)
 
+    def _embed_batches(self, texts: List[str]) -> np.ndarray:
+        # One embeddings request per batch instead of the client's default chunking
+        batch_size = max(1, EMBED_BATCH_SIZE)
+        batches = [texts[start : start + batch_size] for start in range(0, len(texts), batch_size)]
+
+        def embed(batch: List[str]) -> np.ndarray:
+            return np.asarray(self.embedding.embed_documents(batch), dtype=np.float32)
+
+        workers = min(max(1, EMBED_CONCURRENCY), len(batches))
+        if workers == 1:
+            return np.concatenate([embed(batch) for batch in batches])
+        # Batches overlap on the wire; map keeps vectors in text order
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return np.concatenate(list(pool.map(embed, batches)))
+
+    def _maybe_upgrade(self, store: FAISS) -> FAISS:
+        """Rebuild a brute-force index as HNSW once it outgrows FLAT_INDEX_MAX."""
+        index = store.index
+        if self.index_type != "auto" or not isinstance(index, _SCAN_INDEXES) or index.ntotal < FLAT_INDEX_MAX:
+            return store
+        log.info("Upgrading FAISS index with %d vectors to HNSW", index.ntotal)
+        vectors = index.reconstruct_n(0, index.ntotal)
+        upgraded = build_faiss_index(vectors, "hnsw", self.index_quant)
+        upgraded.add(vectors)
+        # Row order is unchanged, so index_to_docstore_id stays valid
+        store.index = upgraded
+        return store
+
     def ingest_directory(self, path: Path, glob: str = "**/*") -> int:
+        file_paths = [p for p in path.glob(glob) if p.suffix.lower() in INGEST_EXTENSIONS and p.is_file()]
         texts: List[Document] = []
-        for file_path in path.glob(glob):
-            if not file_path.is_file():
-                continue
-            ext = file_path.suffix.lower()
-            if ext in {".txt", ".md", ".markdown"}:
-                text = file_path.read_text(encoding="utf-8")
-            elif ext in {".json", ".jsonl"}:
-                text = self._read_json(file_path)
-            else:
-                continue
-            if ext in {".md", ".markdown"}:
-                segments = preprocess_markdown_tables(text, str(file_path))
-                for segment_text, meta in segments:
-                    docs = self.split_text(segment_text, metadata=meta)
-                    texts.extend(docs)
-            else:
-                docs = self.split_text(text, source=str(file_path))
+        # Reading and splitting overlap across threads; map keeps chunk order deterministic
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+            for docs in pool.map(self._process_file, file_paths):
                 texts.extend(docs)
         if not texts:
             return 0
@@ -135,15 +308,48 @@ class VectorStoreManager:
         created = self.ingest_documents(texts)
         return created
 
+    def _process_file(self, file_path: Path) -> List[Document]:
+        ext = file_path.suffix.lower()
+        if ext == ".jsonl":
+            return list(self._iter_jsonl(file_path))
+        if ext == ".json":
+            text = self._read_json(file_path)
+        else:
+            text = file_path.read_text(encoding="utf-8")
+        if ext in {".md", ".markdown"}:
+            docs: List[Document] = []
+            for segment_text, meta in preprocess_markdown_tables(text, str(file_path)):
+                docs.extend(self.split_text(segment_text, metadata=meta))
+            return docs
+        return self.split_text(text, source=str(file_path))
+
+    def _iter_jsonl(self, path: Path) -> Iterator[Document]:
+        # One record per line: each line becomes its own chunk without re-serializing
+        source = str(path)
+        with path.open("r", encoding="utf-8") as fh:
+            for line_no, line in enumerate(fh, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                meta = {"source": source, "line": line_no}
+                if len(line) > self.chunk_size:
+                    yield from self.split_text(line, metadata=meta)
+                else:
+                    yield Document(page_content=line, metadata=meta)
+
     @staticmethod
     def _read_json(path: Path) -> str:
         data = path.read_text(encoding="utf-8")
         try:
-            parsed = json.loads(data)
+            parsed = _json_loads(data)
         except json.JSONDecodeError:
             return data
         if isinstance(parsed, dict):
-            return json.dumps(parsed, ensure_ascii=False, indent=2)
+            return _json_dumps(parsed, indent=True)
         if isinstance(parsed, list):
-            return "\n".join(json.dumps(item, ensure_ascii=False) for item in parsed)
+            buf = io.StringIO()
+            for item in parsed:
+                buf.write(_json_dumps(item))
+                buf.write("\n")
+            return buf.getvalue()
         return data
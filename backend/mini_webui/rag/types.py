@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, TypedDict
+import operator
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
 
 
 class RagConfig(TypedDict, total=False):
@@ -21,10 +22,12 @@ class RagDocument(TypedDict, total=False):
 
 class RagState(TypedDict, total=False):
     query: str
+    config: RagConfig
     language: str
     documents: List[RagDocument]
     answer: str
-    traces: List[Dict[str, Any]]
+    # Nodes return only their new trace entries; LangGraph concatenates them
+    traces: Annotated[List[Dict[str, Any]], operator.add]
 
 
 class RagChunk(TypedDict):
@@ -1,35 +1,53 @@
+import time
+import uuid
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from ..constants import ADMIN_PREFIX
-from ..utils.auth import require_admin, get_db
+from ..utils.auth import AuthUser, invalidate_user, require_admin, get_db, get_read_db, get_write_db
 from ..models.users import UserResponse, User, UserUpdate
 from ..models.chats import Chat
 from ..models.messages import Message
 from ..utils.security import get_password_hash
-from pydantic import BaseModel, EmailStr
+from ..utils.response_cache import clear_response_cache
+from ..utils.settings_cache import invalidate_settings_cache
+from pydantic import BaseModel, EmailStr, TypeAdapter
 from ..models.settings import Setting, SettingModel
 
 
 router = APIRouter(prefix=ADMIN_PREFIX, tags=["admin"])
 
+_EMAIL_TAKEN = select(User.id).where(User.email == bindparam("email"))
+
+# Validate whole result lists in one pydantic-core call
+_user_list_adapter = TypeAdapter(List[UserResponse])
+_setting_list_adapter = TypeAdapter(List[SettingModel])
+
 
 @router.get("/whoami", response_model=UserResponse)
-def whoami(admin: User = Depends(require_admin)):
+def whoami(admin: AuthUser = Depends(require_admin)):
     """Confirm admin identity."""
     return UserResponse.model_validate(admin)
 
 
 @router.get("/stats")
-def stats(db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+def stats(db: Session = Depends(get_read_db), admin: AuthUser = Depends(require_admin)):
     """Basic counts for admin dashboard."""
-    return {
-        "users": db.query(User).count(),
-        "chats": db.query(Chat).count(),
-        "messages": db.query(Message).count(),
-    }
+    # One round-trip: three scalar subqueries in a single row
+    row = db.execute(
+        select(
+            select(func.count()).select_from(User).scalar_subquery().label("users"),
+            select(func.count()).select_from(Chat).scalar_subquery().label("chats"),
+            select(func.count()).select_from(Message).scalar_subquery().label("messages"),
+        )
+    ).one()
+    return {"users": row.users, "chats": row.chats, "messages": row.messages}
 
 
 class UserCreateAdmin(BaseModel):
@@ -46,112 +64,132 @@ class UserList(BaseModel):
 
 @router.get("/users", response_model=UserList)
 def list_users(
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    db: Session = Depends(get_read_db),
+    admin: AuthUser = Depends(require_admin),
     q: Optional[str] = Query(None, description="Search by name or email"),
     offset: int = 0,
     limit: int = Query(50, ge=1, le=200),
 ):
-    query = db.query(User)
+    stmt = select(User)
     if q:
         like = f"%{q}%"
-        query = query.filter((User.name.ilike(like)) | (User.email.ilike(like)))
-    total = query.count()
-    users = query.order_by(User.created_at.desc()).offset(offset).limit(limit).all()
-    return UserList(items=[UserResponse.model_validate(u) for u in users], total=total)
+        stmt = stmt.where((User.name.ilike(like)) | (User.email.ilike(like)))
+    page = stmt.order_by(User.created_at.desc()).offset(offset).limit(limit)
+    count = select(func.count()).select_from(stmt.subquery())
+    if _supports_window_functions(db):
+        # COUNT(*) OVER () returns the filtered total alongside the page in one pass
+        rows = db.execute(page.add_columns(func.count().over().label("total"))).all()
+        users = [row.User for row in rows]
+        # An offset past the end yields no rows to carry the total
+        total = rows[0].total if rows else (db.scalar(count) if offset else 0)
+    else:
+        total = db.scalar(count)
+        users = db.scalars(page).all()
+    return UserList(items=_user_list_adapter.validate_python(users, from_attributes=True), total=total)
 
 
-@router.post("/users", response_model=UserResponse, status_code=201)
-def create_user_admin(payload: UserCreateAdmin, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
-    # Check duplication
-    if db.query(User).filter(User.email == payload.email).first():
-        raise HTTPException(status_code=400, detail="Email already exists")
+def _supports_window_functions(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.name != "sqlite" or dialect.dbapi.sqlite_version_info >= (3, 25, 0)
+
 
+@router.post("/users", response_model=UserResponse, status_code=201)
+def create_user_admin(payload: UserCreateAdmin, db: Session = Depends(get_db), admin: AuthUser = Depends(require_admin)):
+    # No duplicate pre-check: the unique email constraint rejects it, so the
+    # argon2 hash below never runs while the SQLite write lock is held
+    now = int(time.time())
     user = User(
-        id=str(__import__("uuid").uuid4()),
+        id=str(uuid.uuid4()),
         name=payload.name,
         email=str(payload.email),
         password_hash=get_password_hash(payload.password),
         role=payload.role or "user",
         is_active=True,
-        created_at=__import__("time").time().__int__(),
-        updated_at=__import__("time").time().__int__(),
+        created_at=now,
+        updated_at=now,
     )
     db.add(user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email already exists")
     db.refresh(user)
     return UserResponse.model_validate(user)
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-def get_user(user_id: str, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
-    user = db.query(User).filter(User.id == user_id).first()
+def get_user(user_id: str, db: Session = Depends(get_read_db), admin: AuthUser = Depends(require_admin)):
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return UserResponse.model_validate(user)
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-def update_user(user_id: str, payload: UserUpdate, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
-    user = db.query(User).filter(User.id == user_id).first()
+def update_user(user_id: str, payload: UserUpdate, db: Session = Depends(get_write_db), admin: AuthUser = Depends(require_admin)):
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     # Email uniqueness check if email is changed
     if payload.email and payload.email != user.email:
-        if db.query(User).filter(User.email == payload.email).first():
+        if db.execute(_EMAIL_TAKEN, {"email": payload.email}).first():
             raise HTTPException(status_code=400, detail="Email already exists")
 
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(user, field, value)
-    user.updated_at = __import__("time").time().__int__()
+    updates = payload.model_dump(exclude_unset=True)
+    updates["updated_at"] = int(time.time())
+    db.execute(update(User).where(User.id == user_id).values(**updates))
     db.commit()
-    db.refresh(user)
+    invalidate_user(user_id)
     return UserResponse.model_validate(user)
 
 
 @router.post("/users/{user_id}/activate", response_model=UserResponse)
-def activate_user(user_id: str, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
-    user = db.query(User).filter(User.id == user_id).first()
+def activate_user(user_id: str, db: Session = Depends(get_write_db), admin: AuthUser = Depends(require_admin)):
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.is_active = True
-    user.updated_at = __import__("time").time().__int__()
+    user.updated_at = int(time.time())
     db.commit()
+    invalidate_user(user_id)
     db.refresh(user)
     return UserResponse.model_validate(user)
 
 
 @router.post("/users/{user_id}/deactivate", response_model=UserResponse)
-def deactivate_user(user_id: str, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
-    user = db.query(User).filter(User.id == user_id).first()
+def deactivate_user(user_id: str, db: Session = Depends(get_write_db), admin: AuthUser = Depends(require_admin)):
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.is_active = False
-    user.updated_at = __import__("time").time().__int__()
+    user.updated_at = int(time.time())
     db.commit()
+    invalidate_user(user_id)
     db.refresh(user)
     return UserResponse.model_validate(user)
 
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: str, hard: bool = False, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
-    user = db.query(User).filter(User.id == user_id).first()
+def delete_user(user_id: str, hard: bool = False, db: Session = Depends(get_write_db), admin: AuthUser = Depends(require_admin)):
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     if not hard:
         user.is_active = False
-        user.updated_at = __import__("time").time().__int__()
+        user.updated_at = int(time.time())
         db.commit()
+        invalidate_user(user_id)
         return {"status": "deactivated", "id": user_id}
 
-    # Hard delete: remove messages -> chats -> user
-    chat_ids = [c.id for c in db.query(Chat.id).filter(Chat.user_id == user_id).all()]
-    if chat_ids:
-        db.query(Message).filter(Message.chat_id.in_(chat_ids)).delete(synchronize_session=False)
-        db.query(Chat).filter(Chat.id.in_(chat_ids)).delete(synchronize_session=False)
+    # Hard delete: remove messages -> chats -> user; the subquery keeps chat ids in the DB
+    user_chats = select(Chat.id).where(Chat.user_id == user_id)
+    db.execute(delete(Message).where(Message.chat_id.in_(user_chats)), execution_options={"synchronize_session": False})
+    db.execute(delete(Chat).where(Chat.user_id == user_id), execution_options={"synchronize_session": False})
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
     return {"status": "deleted", "id": user_id}
 
 
@@ -164,75 +202,91 @@ class AdminSettings(BaseModel):
     debug: Optional[bool] = None
 
 
-def _get_setting(db: Session, key: str) -> Optional[Setting]:
-    return db.query(Setting).filter(Setting.key == key).first()
-
-
-def _set_setting(db: Session, key: str, value: Optional[str], description: Optional[str] = None, category: Optional[str] = None) -> Setting:
-    import time as _t
-    s = _get_setting(db, key)
-    now = int(_t.time())
-    if s is None:
-        s = Setting(
-            id=str(__import__("uuid").uuid4()),
-            key=key,
-            value=value or "",
-            description=description,
-            category=category,
-            created_at=now,
-            updated_at=now,
-        )
-        db.add(s)
+# key -> (description, category) for the settings exposed through AdminSettings
+ADMIN_SETTING_KEYS = {
+    "openai_api_key": ("OpenAI API Key", "openai"),
+    "openai_api_base": ("OpenAI API Base URL", "openai"),
+    "app_name": ("Application Name", "app"),
+    "debug": ("Debug Mode", "app"),
+}
+
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+_ADMIN_SETTINGS = select(Setting.key, Setting.value).where(Setting.key.in_(ADMIN_SETTING_KEYS))
+_ALL_SETTINGS = select(Setting).order_by(Setting.key.asc())
+
+
+def _upsert_settings(db: Session, values: dict) -> None:
+    """Write ``values`` (key -> value) in a single INSERT ... ON CONFLICT (key) DO UPDATE."""
+    now = int(time.time())
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "key": key,
+            "value": value or "",
+            "description": ADMIN_SETTING_KEYS[key][0],
+            "category": ADMIN_SETTING_KEYS[key][1],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for key, value in values.items()
+    ]
+    insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        # No portable upsert: update existing keys, add the rest
+        existing = {s.key: s for s in db.scalars(select(Setting).where(Setting.key.in_(values)))}
+        for row in rows:
+            setting = existing.get(row["key"])
+            if setting is None:
+                db.add(Setting(**row))
+            else:
+                for field in ("value", "description", "category", "updated_at"):
+                    setattr(setting, field, row[field])
     else:
-        s.value = value or ""
-        if description is not None:
-            s.description = description
-        if category is not None:
-            s.category = category
-        s.updated_at = now
+        stmt = insert(Setting).values(rows)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Setting.key],
+                set_={
+                    "value": stmt.excluded.value,
+                    "description": stmt.excluded.description,
+                    "category": stmt.excluded.category,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+        )
     db.commit()
-    db.refresh(s)
-    return s
 
 
 @router.get("/settings", response_model=AdminSettings)
-def get_settings(db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+def get_settings(db: Session = Depends(get_read_db), admin: AuthUser = Depends(require_admin)):
     """Return selected system settings for admin view."""
-    def val(k: str) -> Optional[str]:
-        s = _get_setting(db, k)
-        return s.value if s else None
-
-    def val_bool(k: str) -> Optional[bool]:
-        s = _get_setting(db, k)
-        if not s or s.value is None:
-            return None
-        return s.value.lower() in ("true", "1", "yes", "on")
-
+    values = dict(db.execute(_ADMIN_SETTINGS).all())
+    debug = values.get("debug")
     return AdminSettings(
-        openai_api_key=val("openai_api_key"),
-        openai_api_base=val("openai_api_base"),
-        app_name=val("app_name"),
-        debug=val_bool("debug"),
+        openai_api_key=values.get("openai_api_key"),
+        openai_api_base=values.get("openai_api_base"),
+        app_name=values.get("app_name"),
+        debug=None if debug is None else debug.lower() in ("true", "1", "yes", "on"),
     )
 
 
 @router.put("/settings", response_model=AdminSettings)
-def update_settings(payload: AdminSettings, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+def update_settings(payload: AdminSettings, db: Session = Depends(get_db), admin: AuthUser = Depends(require_admin)):
     """Upsert selected system settings. Returns the updated values."""
-    if payload.openai_api_key is not None:
-        _set_setting(db, "openai_api_key", payload.openai_api_key, description="OpenAI API Key", category="openai")
-    if payload.openai_api_base is not None:
-        _set_setting(db, "openai_api_base", payload.openai_api_base, description="OpenAI API Base URL", category="openai")
-    if payload.app_name is not None:
-        _set_setting(db, "app_name", payload.app_name, description="Application Name", category="app")
-    if payload.debug is not None:
-        _set_setting(db, "debug", "true" if payload.debug else "false", description="Debug Mode", category="app")
+    values = payload.model_dump(exclude_none=True)
+    if "debug" in values:
+        values["debug"] = "true" if values["debug"] else "false"
+    if values:
+        _upsert_settings(db, values)
+        invalidate_settings_cache()
+        # A new endpoint may serve different answers for the same prompt
+        clear_response_cache()
 
     return get_settings(db, admin)
 
 
 @router.get("/settings/all", response_model=List[SettingModel])
-def list_all_settings(db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+def list_all_settings(db: Session = Depends(get_read_db), admin: AuthUser = Depends(require_admin)):
     """List all raw settings (for troubleshooting)."""
-    rows = db.query(Setting).order_by(Setting.key.asc()).all()
-    return [SettingModel.model_validate(r) for r in rows]
+    rows = db.scalars(_ALL_SETTINGS).all()
+    return _setting_list_adapter.validate_python(rows, from_attributes=True)
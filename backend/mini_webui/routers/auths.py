@@ -3,17 +3,20 @@ import time
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from ..constants import AUTH_PREFIX
 from ..models.users import UserResponse, User
 from ..utils.auth import (
+    AuthUser,
     TokenResponse,
     authenticate_user,
     create_user,
     get_current_user,
     get_current_user_required,
     get_db,
+    invalidate_user,
 )
 from ..utils.security import create_access_token
 
@@ -63,12 +66,9 @@ def me(current_user: User = Depends(get_current_user)):
 def update_me(
     payload: ProfileUpdateRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_required),
+    current_user: AuthUser = Depends(get_current_user_required),
 ):
-    user = db.query(User).filter(User.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
+    user = current_user
     updates = payload.model_dump(exclude_unset=True)
     if not updates:
         return UserResponse.model_validate(user)
@@ -83,9 +83,11 @@ def update_me(
         if optional_field in updates and updates[optional_field] is not None:
             updates[optional_field] = updates[optional_field].strip() or None
 
-    for field, value in updates.items():
-        setattr(user, field, value)
-    user.updated_at = int(time.time())
+    updates["updated_at"] = int(time.time())
+    # Single UPDATE of just the touched columns. current_user was loaded by the
+    # async auth session, so the response applies the same values to it instead
+    # of re-reading the row
+    db.execute(update(User).where(User.id == user.id).values(**updates))
     db.commit()
-    db.refresh(user)
-    return UserResponse.model_validate(user)
+    invalidate_user(user.id)
+    return UserResponse.model_validate(user).model_copy(update=updates)
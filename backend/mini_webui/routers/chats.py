@@ -1,28 +1,129 @@
+import asyncio
 import time
-import uuid
-import json
 from typing import Any, Dict, List, Optional
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
 
 from ..constants import CHATS_PREFIX
 from ..models.chats import Chat, ChatCreate, ChatModel, ChatResponse
 from ..models.messages import Message, MessageModel, MessageCreate
-from ..utils.auth import get_current_user, get_db, GuestUser
+from ..utils.auth import get_current_user, get_db, get_read_db, GuestUser
+from ..utils.guest_sessions import get_history, save_history
+from ..utils.ids import new_id
 from ..utils.openai import chat_completion, stream_chat_completion
-from ..config import OPENAI_MODEL, OPENAI_API_BASE, RAG_ALLOW_STREAMING
-from ..rag import get_rag_service
-from ..models.settings import Setting
-from ..internal.db import SessionLocal
+from ..config import GUEST_HISTORY_MAX_CHARS, LLM_HISTORY_MAX_MESSAGES, RAG_ALLOW_STREAMING
+from ..utils.settings_cache import OpenAIConfig, resolve_openai_config
+from ..utils.sse import SSE_DONE, SSE_HEADERS, StreamStats, coalesce_chunks, sse_data, sse_json
+from ..internal.db import JSONField, get_async_session, get_async_sessionmaker, json_append, json_last_value
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # pragma: no cover - optional speedup
+    from json import loads as json_loads
 
 
 router = APIRouter(prefix=CHATS_PREFIX, tags=["chats"])
 log = logging.getLogger("mini_webui.chats")
 
+# Characters of the last message returned with each chat in the list view
+PREVIEW_CHARS = 200
+
+# Columns behind ChatResponse; list views never need the full transcript
+CHAT_LIST_COLUMNS = (
+    Chat.id,
+    Chat.title,
+    Chat.archived,
+    Chat.pinned,
+    Chat.share_id,
+    Chat.created_at,
+    Chat.updated_at,
+)
+
+# Serialize whole result lists in one pydantic-core call
+_chat_list_adapter = TypeAdapter(List[ChatResponse])
+_message_list_adapter = TypeAdapter(List[MessageModel])
+
+
+def _from_row(model: type[BaseModel], row: Any) -> Any:
+    """Build ``model`` from a row of our own tables without re-running validation."""
+    return model.model_construct(**{name: getattr(row, name) for name in model.model_fields})
+
+
+def messages_for_api(history: List[Dict[str, Any]], content: str) -> List[Dict[str, Any]]:
+    """Role/content pairs for the model: the recent ``history`` plus the new user turn.
+
+    Only the last LLM_HISTORY_MAX_MESSAGES entries are projected (a leading
+    system message is kept), so long chats cost the same per turn.
+    """
+    window = history
+    if 0 < LLM_HISTORY_MAX_MESSAGES < len(history) + 1:
+        window = history[len(history) + 1 - LLM_HISTORY_MAX_MESSAGES:]
+        if history[0].get("role") == "system":
+            window = [history[0], *window[1:]]
+    messages = [{"role": m.get("role"), "content": m.get("content")} for m in window]
+    messages.append({"role": "user", "content": content})
+    return messages
+
+
+def guest_history(
+    messages: str = Query(
+        "[]",
+        max_length=GUEST_HISTORY_MAX_CHARS,
+        description="Previous conversation history as JSON string",
+    ),
+) -> List[Dict[str, Any]]:
+    """Decode the guest stream's JSON history; the length cap is checked before parsing."""
+    if not messages:
+        return []
+    try:
+        history = json_loads(messages)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid messages JSON")
+    if not isinstance(history, list) or not all(isinstance(m, dict) for m in history):
+        raise HTTPException(status_code=400, detail="messages must be a JSON array of objects")
+    return history
+
+
+def _json_response(body: bytes, status_code: int = 200) -> Response:
+    # A Response is sent as-is: FastAPI skips validating it against response_model
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+# Hot statements are built once at import: requests only bind parameters and
+# reuse the engine's compiled SQL instead of rebuilding and re-keying queries
+
+# The sidebar preview is projected in SQL, so the transcript never leaves the
+# database; ordering is served by user_id_updated_at_idx
+_CHAT_LIST = select(
+    *CHAT_LIST_COLUMNS,
+    func.substr(json_last_value(Chat.chat, "content"), 1, PREVIEW_CHARS).label("last_message"),
+).order_by(Chat.updated_at.desc())
+_OWN_CHAT_LIST = _CHAT_LIST.where(Chat.user_id == bindparam("user_id"))
+# Ownership checks only need user_id; skip decoding the transcript
+_CHAT_OWNER = select(Chat).options(load_only(Chat.id, Chat.user_id)).where(Chat.id == bindparam("chat_id"))
+# Message ids are UUIDv7, so id orders turns written within the same second
+_CHAT_MESSAGES = (
+    select(Message)
+    .where(Message.chat_id == bindparam("chat_id"))
+    .order_by(Message.created_at.asc(), Message.id.asc())
+)
+_DELETE_CHAT_MESSAGES = (
+    delete(Message)
+    .where(Message.chat_id == bindparam("chat_id"))
+    .execution_options(synchronize_session=False)
+)
+_APPEND_TRANSCRIPT = (
+    update(Chat)
+    .where(Chat.id == bindparam("chat_id"))
+    .values(chat=json_append(Chat.chat, bindparam("entry", type_=JSONField())), updated_at=bindparam("ts"))
+    .execution_options(synchronize_session=False)
+)
+
 
 class CreateChatRequest(ChatCreate):
     pass
@@ -41,6 +142,7 @@ class SendMessageRequest(BaseModel):
 class GuestChatRequest(BaseModel):
     content: str
     messages: List[dict] = []  # Previous conversation history
+    conversation_id: Optional[str] = None  # Server-side history; takes precedence over messages
     model: Optional[str] = None
     temperature: Optional[float] = None
     api_base: Optional[str] = None
@@ -53,6 +155,7 @@ class GuestChatResponse(BaseModel):
     response: str
     messages: List[dict]  # Updated conversation history
     data: Optional[dict] = None
+    conversation_id: Optional[str] = None
 
 
 def ensure_owner_or_admin(chat: Chat, current_user: Any):
@@ -69,20 +172,243 @@ def is_guest_user(user: Any) -> bool:
     return isinstance(user, GuestUser)
 
 
+# In-flight background reply writes by chat id. Also keeps the strong reference
+# the event loop doesn't, so a task can't be collected before it finishes.
+_pending_writes: dict[str, asyncio.Task] = {}
+
+
+def _spawn_write(chat_id: str, coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _pending_writes[chat_id] = task
+
+    def _done(finished: asyncio.Task) -> None:
+        if _pending_writes.get(chat_id) is finished:
+            del _pending_writes[chat_id]
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def wait_for_pending_write(chat_id: str) -> None:
+    """Dependency: let this process's write of a streamed reply land before the chat is read.
+
+    A completed stream commits its reply before [DONE], so this only matters
+    when the client disconnected mid-stream and the write finished on its own;
+    it keeps a quick reload or retry from reading the transcript without it.
+    """
+    task = _pending_writes.get(chat_id)
+    if task is not None:
+        await asyncio.wait({task})
+
+
+async def drain_background_tasks() -> None:
+    """Wait for pending background writes (called on shutdown)."""
+    if _pending_writes:
+        await asyncio.wait(list(_pending_writes.values()))
+
+
+async def _persist_stream_reply(chat_id: str, full_text: str) -> None:
+    """Write a streamed assistant reply on its own session."""
+    ts = int(time.time())
+    assistant_entry: dict[str, Any] = {"role": "assistant", "content": full_text, "timestamp": ts}
+    try:
+        async with get_async_sessionmaker()() as db:
+            if not await _append_transcript(db, chat_id, assistant_entry, ts):
+                log.warning("Chat %s missing when persisting assistant stream", chat_id)
+                return
+            db.add(
+                Message(
+                    id=new_id(),
+                    chat_id=chat_id,
+                    role="assistant",
+                    content=full_text,
+                    created_at=ts,
+                    updated_at=ts,
+                )
+            )
+            await db.commit()
+        log.debug("Persisted assistant message for chat %s (chars=%d)", chat_id, len(full_text))
+    except Exception:
+        log.error("Failed to persist assistant message for chat %s", chat_id, exc_info=True)
+
+
+async def _append_transcript(db: AsyncSession, chat_id: str, entry: dict[str, Any], ts: int) -> bool:
+    """Append one entry to the chat's JSON transcript in SQL and bump updated_at.
+
+    Only ``entry`` is serialized, so a turn costs the same on a 200-message
+    chat as on a new one. Returns False when the chat no longer exists.
+    """
+    result = await db.execute(_APPEND_TRANSCRIPT, {"chat_id": chat_id, "entry": entry, "ts": ts})
+    return result.rowcount > 0
+
+
+# ======== Guest Chat Endpoints (declared before the /{chat_id} routes, which would otherwise match them) ========
+
+@router.post("/guest/chat", response_model=GuestChatResponse)
+async def guest_chat(
+    req: GuestChatRequest,
+    openai_config: OpenAIConfig = Depends(resolve_openai_config),
+):
+    """Guest chat endpoint - no persistence, memory-only conversation"""
+    log.info("Guest chat: content_len=%d messages_count=%d", len(req.content or ""), len(req.messages or []))
+
+    # Build messages for OpenAI call (include history + new user message)
+    ts = int(time.time())
+    history = get_history(req.conversation_id)
+    if history is None:
+        history = req.messages or []
+    api_messages = messages_for_api(history, req.content)
+
+    llm = openai_config.override(req.model, req.api_base)
+    assistant_content: str
+    assistant_data: Optional[dict[str, Any]] = None
+
+    if req.use_rag:
+        from ..rag import get_rag_service  # deferred: pulls in LangChain
+        rag_service = get_rag_service()
+        log.debug("Calling RAG service for guest chat")
+        rag_config: Dict[str, Any] = {}
+        if req.rag_top_k is not None:
+            rag_config["top_k"] = max(1, int(req.rag_top_k))
+        if req.rag_temperature is not None:
+            rag_config["temperature"] = float(req.rag_temperature)
+        rag_result = await rag_service.aquery(req.content, config=rag_config)
+        assistant_content = rag_result.get("answer", "")
+        assistant_data = {
+            "mode": "rag",
+            "documents": rag_result.get("documents", []),
+            "traces": rag_result.get("traces", []),
+        }
+        if rag_config:
+            assistant_data["config"] = rag_config
+    else:
+        log.debug("Calling OpenAI (non-stream) model=%s", llm.model)
+        assistant_content = await chat_completion(
+            messages=api_messages,
+            model=llm.model,
+            temperature=req.temperature,
+            api_key=llm.api_key,
+            base_url=llm.base_url,
+        )
+
+    ts2 = int(time.time())
+    updated_messages = list(history)
+    updated_messages.append({"role": "user", "content": req.content, "timestamp": ts})
+    updated_messages.append({
+        "role": "assistant",
+        "content": assistant_content,
+        "timestamp": ts2,
+        "data": assistant_data,
+    })
+
+    conversation_id = save_history(req.conversation_id, updated_messages)
+    return GuestChatResponse(
+        response=assistant_content,
+        messages=updated_messages,
+        data=assistant_data,
+        conversation_id=conversation_id,
+    )
+
+
+@router.get("/guest/stream")
+@router.get("/guest-stream")
+async def guest_chat_stream(
+    content: str = Query(..., description="User message content"),
+    prev_messages: List[Dict[str, Any]] = Depends(guest_history),
+    conversation_id: Optional[str] = Query(None, description="Server-side history id from a previous reply"),
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    api_base: Optional[str] = None,
+    use_rag: bool = Query(False, description="Use LangGraph RAG pipeline"),
+    rag_top_k: Optional[int] = Query(None, ge=1, le=20),
+    rag_temperature: Optional[float] = Query(None, ge=0.0, le=2.0),
+    openai_config: OpenAIConfig = Depends(resolve_openai_config),
+):
+    """Guest chat streaming endpoint - no persistence, memory-only conversation"""
+    log.info("Guest chat stream: content_len=%d", len(content or ""))
+    ts = int(time.time())
+
+    if use_rag and not RAG_ALLOW_STREAMING:
+        raise HTTPException(status_code=400, detail="RAG streaming is not enabled")
+
+    history = get_history(conversation_id)
+    if history is None:
+        history = prev_messages
+    api_messages = messages_for_api(history, content)
+
+    if use_rag:
+        raise HTTPException(status_code=400, detail="Streaming with RAG is not supported yet")
+
+    llm = openai_config.override(model, api_base)
+
+    async def sse_gen():
+        assistant_text_parts: list[str] = []
+        stats = StreamStats()
+        try:
+            async for chunk in coalesce_chunks(stream_chat_completion(
+                messages=api_messages,
+                model=llm.model,
+                temperature=temperature,
+                api_key=llm.api_key,
+                base_url=llm.base_url,
+            )):
+                assistant_text_parts.append(chunk)
+                stats.record(chunk)
+                yield sse_data(chunk)
+        except Exception:
+            log.warning("Streaming failed, falling back to non-streaming", exc_info=True)
+            try:
+                full = await chat_completion(
+                    messages=api_messages,
+                    model=llm.model,
+                    temperature=temperature,
+                    api_key=llm.api_key,
+                    base_url=llm.base_url,
+                )
+                assistant_text_parts.append(full)
+                stats.record(full)
+                yield sse_data(full)
+            except Exception as e:
+                log.error("Non-streaming fallback also failed: %s", e, exc_info=True)
+                yield sse_data(f"Error: {e}")
+        finally:
+            # Saved even if the client disconnected; only the frames below need it
+            stats.log_summary(log, "Guest stream")
+            full_text = "".join(assistant_text_parts)
+            updated_messages = list(history)
+            updated_messages.append({"role": "user", "content": content, "timestamp": ts})
+            updated_messages.append({"role": "assistant", "content": full_text, "timestamp": int(time.time())})
+            cid = save_history(conversation_id, updated_messages)
+        yield sse_json({'type': 'messages', 'data': updated_messages, 'conversation_id': cid})
+        yield SSE_DONE
+
+    return StreamingResponse(
+        sse_gen(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @router.get("", response_model=List[ChatResponse])
-def list_chats(db: Session = Depends(get_db), user: Any = Depends(get_current_user)):
+def list_chats(
+    db: Session = Depends(get_read_db),
+    user: Any = Depends(get_current_user),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (default: all chats)"),
+):
     log.info("List chats: user=%s role=%s", getattr(user, 'id', '?'), getattr(user, 'role', '?'))
     
     # Guest users don't have saved chats
     if is_guest_user(user):
         return []
     
-    query = db.query(Chat)
     # Admins can view all chats; regular users only their own
-    if getattr(user, 'role', 'user') != 'admin':
-        query = query.filter(Chat.user_id == user.id)
-    chats = query.order_by(Chat.updated_at.desc()).all()
-    return [ChatResponse.model_validate(c) for c in chats]
+    stmt = _CHAT_LIST if getattr(user, 'role', 'user') == 'admin' else _OWN_CHAT_LIST
+    if offset or limit is not None:
+        # LIMIT/OFFSET render as bound parameters and keep the compiled cache entry
+        stmt = stmt.offset(offset).limit(limit)
+    rows = db.execute(stmt, {"user_id": user.id}).all()
+    return _json_response(_chat_list_adapter.dump_json([_from_row(ChatResponse, r) for r in rows]))
 
 
 @router.post("", response_model=ChatModel, status_code=201)
@@ -95,7 +421,7 @@ def create_chat(payload: CreateChatRequest, db: Session = Depends(get_db), user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Guest users cannot create persistent chats")
     
     chat = Chat(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         user_id=user.id,
         title=payload.title,
         chat=payload.chat or [],
@@ -108,40 +434,55 @@ def create_chat(payload: CreateChatRequest, db: Session = Depends(get_db), user:
     db.add(chat)
     db.commit()
     db.refresh(chat)
-    return ChatModel.model_validate(chat)
+    return _json_response(_from_row(ChatModel, chat).model_dump_json().encode(), status_code=201)
 
 
-@router.get("/{chat_id}", response_model=ChatModel)
-def get_chat(chat_id: str, db: Session = Depends(get_db), user: Any = Depends(get_current_user)):
+@router.get("/{chat_id}", response_model=ChatModel, dependencies=[Depends(wait_for_pending_write)])
+def get_chat(chat_id: str, db: Session = Depends(get_read_db), user: Any = Depends(get_current_user)):
     log.info("Get chat: user=%s chat_id=%s", getattr(user, 'id', '?'), chat_id)
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    chat = db.get(Chat, chat_id)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    ensure_owner_or_admin(chat, user)
+    return _json_response(_from_row(ChatModel, chat).model_dump_json().encode())
+
+
+@router.get("/{chat_id}/messages", response_model=List[MessageModel], dependencies=[Depends(wait_for_pending_write)])
+def list_messages(chat_id: str, db: Session = Depends(get_read_db), user: Any = Depends(get_current_user)):
+    """Messages of a chat from the append-only message table, oldest first."""
+    params = {"chat_id": chat_id}
+    chat = db.execute(_CHAT_OWNER, params).scalar_one_or_none()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     ensure_owner_or_admin(chat, user)
-    return ChatModel.model_validate(chat)
+    # Served by chat_id_created_at_idx
+    rows = db.execute(_CHAT_MESSAGES, params).scalars().all()
+    return _json_response(_message_list_adapter.dump_json([_from_row(MessageModel, m) for m in rows]))
 
 
 @router.delete("/{chat_id}")
 def delete_chat(chat_id: str, db: Session = Depends(get_db), user: Any = Depends(get_current_user)):
     log.info("Delete chat: user=%s chat_id=%s", getattr(user, 'id', '?'), chat_id)
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    params = {"chat_id": chat_id}
+    chat = db.execute(_CHAT_OWNER, params).scalar_one_or_none()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     ensure_owner_or_admin(chat, user)
 
     # Delete related messages first
-    db.query(Message).filter(Message.chat_id == chat_id).delete()
+    db.execute(_DELETE_CHAT_MESSAGES, params)
     db.delete(chat)
     db.commit()
     return {"status": "deleted", "id": chat_id}
 
 
-@router.post("/{chat_id}/messages")
-def send_message(
+@router.post("/{chat_id}/messages", dependencies=[Depends(wait_for_pending_write)])
+async def send_message(
     chat_id: str,
     req: SendMessageRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     user: Any = Depends(get_current_user),
+    openai_config: OpenAIConfig = Depends(resolve_openai_config),
 ):
     log.info(
         "Send message: user=%s chat_id=%s len=%d rag=%s",
@@ -150,14 +491,14 @@ def send_message(
         len(req.content or ""),
         req.use_rag,
     )
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    chat = await db.get(Chat, chat_id)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     ensure_owner_or_admin(chat, user)
 
     ts = int(time.time())
 
-    # Persist user message
+    # User message row
     user_data: Optional[dict[str, Any]] = None
     rag_config_payload: Optional[Dict[str, Any]] = None
     if req.use_rag:
@@ -171,7 +512,7 @@ def send_message(
             user_data["config"] = rag_config_payload
 
     user_msg = Message(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         chat_id=chat_id,
         role="user",
         content=req.content,
@@ -179,57 +520,59 @@ def send_message(
         created_at=ts,
         updated_at=ts,
     )
-    db.add(user_msg)
 
-    # Update chat JSON transcript
-    transcript = list(chat.chat or [])
+    # Appended to the chat JSON transcript
     transcript_entry: dict[str, Any] = {"role": "user", "content": req.content, "timestamp": ts}
     if user_data:
         transcript_entry["data"] = user_data
-    transcript.append(transcript_entry)
 
     # Build messages for OpenAI call (include history)
-    messages_for_api = [
-        {"role": m.get("role"), "content": m.get("content")} for m in transcript
-    ]
-
-    # Resolve OpenAI config (DB overrides)
-    def get_setting(key: str) -> Optional[str]:
-        s = db.query(Setting).filter(Setting.key == key).first()
-        return (s.value if s and s.value else None)
-
-    model = req.model or OPENAI_MODEL
-    api_key = get_setting("openai_api_key")
-    base_url = req.api_base or get_setting("openai_api_base") or OPENAI_API_BASE
-    assistant_content: str
-    assistant_data: Optional[dict[str, Any]] = None
-
-    if req.use_rag:
-        rag_service = get_rag_service()
-        log.info("Calling RAG service for chat %s", chat_id)
-        rag_result = rag_service.query(req.content, config=rag_config_payload or None)
-        assistant_content = rag_result.get("answer", "")
-        assistant_data = {
-            "mode": "rag",
-            "documents": rag_result.get("documents", []),
-            "traces": rag_result.get("traces", []),
-        }
-        if rag_config_payload:
-            assistant_data["config"] = rag_config_payload
-    else:
-        log.info("Calling OpenAI (non-stream) model=%s", model)
-        assistant_content = chat_completion(
-            messages=messages_for_api,
-            model=model,
+    api_messages = messages_for_api(chat.chat or [], req.content)
+
+    llm = openai_config.override(req.model, req.api_base)
+
+    async def persist_user_turn() -> None:
+        db.add(user_msg)
+        await _append_transcript(db, chat_id, transcript_entry, ts)
+        await db.commit()
+
+    async def generate() -> tuple[str, Optional[dict[str, Any]]]:
+        if req.use_rag:
+            from ..rag import get_rag_service  # deferred: pulls in LangChain
+            rag_service = get_rag_service()
+            log.debug("Calling RAG service for chat %s", chat_id)
+            rag_result = await rag_service.aquery(req.content, config=rag_config_payload or None)
+            rag_data: dict[str, Any] = {
+                "mode": "rag",
+                "documents": rag_result.get("documents", []),
+                "traces": rag_result.get("traces", []),
+            }
+            if rag_config_payload:
+                rag_data["config"] = rag_config_payload
+            return rag_result.get("answer", ""), rag_data
+        log.debug("Calling OpenAI (non-stream) model=%s", llm.model)
+        content = await chat_completion(
+            messages=api_messages,
+            model=llm.model,
             temperature=req.temperature,
-            api_key=api_key,
-            base_url=base_url,
+            api_key=llm.api_key,
+            base_url=llm.base_url,
         )
+        return content, None
+
+    # Commit the user turn while the model works: the upstream call never touches
+    # the session. Both are awaited before any error propagates, so the session
+    # is never torn down mid-commit.
+    persisted, generated = await asyncio.gather(persist_user_turn(), generate(), return_exceptions=True)
+    for outcome in (persisted, generated):
+        if isinstance(outcome, BaseException):
+            raise outcome
+    assistant_content, assistant_data = generated
 
     ts2 = int(time.time())
-    # Persist assistant message
+    # Assistant message row
     assistant_msg = Message(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         chat_id=chat_id,
         role="assistant",
         content=assistant_content,
@@ -237,7 +580,6 @@ def send_message(
         created_at=ts2,
         updated_at=ts2,
     )
-    db.add(assistant_msg)
 
     # Update chat record
     assistant_entry: dict[str, Any] = {
@@ -247,11 +589,9 @@ def send_message(
     }
     if assistant_data:
         assistant_entry["data"] = assistant_data
-    transcript.append(assistant_entry)
-    chat.chat = transcript
-    chat.updated_at = ts2
-
-    db.commit()
+    db.add(assistant_msg)
+    await _append_transcript(db, chat_id, assistant_entry, ts2)
+    await db.commit()
 
     return {
         "chat_id": chat_id,
@@ -264,168 +604,16 @@ def send_message(
     }
 
 
-# ======== Guest Chat Endpoints (must be declared BEFORE /{chat_id}/stream to avoid route conflicts) ========
-
-@router.post("/guest/chat", response_model=GuestChatResponse)
-def guest_chat(
-    req: GuestChatRequest,
-    db: Session = Depends(get_db),
-):
-    """Guest chat endpoint - no persistence, memory-only conversation"""
-    log.info("Guest chat: content_len=%d messages_count=%d", len(req.content or ""), len(req.messages or []))
-
-    # Build messages for OpenAI call (include history + new user message)
-    ts = int(time.time())
-    messages_for_api = list(req.messages or [])
-    messages_for_api.append({"role": "user", "content": req.content})
-
-    # Resolve OpenAI config (DB overrides)
-    def get_setting(key: str) -> Optional[str]:
-        s = db.query(Setting).filter(Setting.key == key).first()
-        return (s.value if s and s.value else None)
-
-    model = req.model or OPENAI_MODEL
-    api_key = get_setting("openai_api_key")
-    base_url = req.api_base or get_setting("openai_api_base") or OPENAI_API_BASE
-    assistant_content: str
-    assistant_data: Optional[dict[str, Any]] = None
-
-    if req.use_rag:
-        rag_service = get_rag_service()
-        log.info("Calling RAG service for guest chat")
-        rag_config: Dict[str, Any] = {}
-        if req.rag_top_k is not None:
-            rag_config["top_k"] = max(1, int(req.rag_top_k))
-        if req.rag_temperature is not None:
-            rag_config["temperature"] = float(req.rag_temperature)
-        rag_result = rag_service.query(req.content, config=rag_config)
-        assistant_content = rag_result.get("answer", "")
-        assistant_data = {
-            "mode": "rag",
-            "documents": rag_result.get("documents", []),
-            "traces": rag_result.get("traces", []),
-        }
-        if rag_config:
-            assistant_data["config"] = rag_config
-    else:
-        log.info("Calling OpenAI (non-stream) model=%s", model)
-        assistant_content = chat_completion(
-            messages=messages_for_api,
-            model=model,
-            temperature=req.temperature,
-            api_key=api_key,
-            base_url=base_url,
-        )
-
-    updated_messages = list(req.messages or [])
-    updated_messages.append({"role": "user", "content": req.content, "timestamp": ts})
-    updated_messages.append({
-        "role": "assistant",
-        "content": assistant_content,
-        "timestamp": int(time.time()),
-        "data": assistant_data,
-    })
-
-    return GuestChatResponse(response=assistant_content, messages=updated_messages, data=assistant_data)
-
-
-@router.get("/guest/stream")
-@router.get("/guest-stream")
-def guest_chat_stream(
-    content: str = Query(..., description="User message content"),
-    messages: str = Query("[]", description="Previous conversation history as JSON string"),
-    model: Optional[str] = None,
-    temperature: Optional[float] = None,
-    api_base: Optional[str] = None,
-    use_rag: bool = Query(False, description="Use LangGraph RAG pipeline"),
-    rag_top_k: Optional[int] = Query(None, ge=1, le=20),
-    rag_temperature: Optional[float] = Query(None, ge=0.0, le=2.0),
-    db: Session = Depends(get_db),
-):
-    """Guest chat streaming endpoint - no persistence, memory-only conversation"""
-    log.info("Guest chat stream: content_len=%d", len(content or ""))
-
-    if use_rag and not RAG_ALLOW_STREAMING:
-        raise HTTPException(status_code=400, detail="RAG streaming is not enabled")
-
-    try:
-        prev_messages = json.loads(messages) if messages else []
-    except json.JSONDecodeError:
-        prev_messages = []
-
-    messages_for_api = list(prev_messages)
-    messages_for_api.append({"role": "user", "content": content})
-
-    if use_rag:
-        raise HTTPException(status_code=400, detail="Streaming with RAG is not supported yet")
-
-    used_model = model or OPENAI_MODEL
-
-    def get_setting(key: str) -> Optional[str]:
-        s = db.query(Setting).filter(Setting.key == key).first()
-        return (s.value if s and s.value else None)
-
-    api_key = get_setting("openai_api_key")
-    base_url_final = api_base or get_setting("openai_api_base") or OPENAI_API_BASE
-
-    def sse_gen():
-        assistant_text_parts: list[str] = []
-        try:
-            for chunk in stream_chat_completion(
-                messages=messages_for_api,
-                model=used_model,
-                temperature=temperature,
-                api_key=api_key,
-                base_url=base_url_final,
-            ):
-                assistant_text_parts.append(chunk)
-                for line in chunk.splitlines() or [""]:
-                    log.debug("SSE chunk line len=%d", len(line))
-                    yield f"data: {line}\n\n"
-        except Exception:
-            log.warning("Streaming failed, falling back to non-streaming", exc_info=True)
-            try:
-                full = chat_completion(
-                    messages=messages_for_api,
-                    model=used_model,
-                    temperature=temperature,
-                    api_key=api_key,
-                    base_url=base_url_final,
-                )
-                assistant_text_parts.append(full)
-                for line in full.splitlines() or [""]:
-                    yield f"data: {line}\n\n"
-            except Exception as e:
-                log.error("Non-streaming fallback also failed: %s", e, exc_info=True)
-                yield f"data: Error: {str(e)}\n\n"
-        finally:
-            full_text = "".join(assistant_text_parts)
-            ts = int(time.time())
-            updated_messages = list(prev_messages)
-            updated_messages.append({"role": "user", "content": content, "timestamp": ts})
-            updated_messages.append({"role": "assistant", "content": full_text, "timestamp": int(time.time())})
-            yield f"data: {json.dumps({'type': 'messages', 'data': updated_messages})}\n\n"
-            yield "data: [DONE]\n\n"
-
-    return StreamingResponse(
-        sse_gen(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
-
-@router.get("/{chat_id}/stream")
-def stream_message(
+@router.get("/{chat_id}/stream", dependencies=[Depends(wait_for_pending_write)])
+async def stream_message(
     chat_id: str,
     content: str,
     model: Optional[str] = None,
     temperature: Optional[float] = None,
     api_base: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     user: Any = Depends(get_current_user),
+    openai_config: OpenAIConfig = Depends(resolve_openai_config),
     use_rag: bool = Query(False, description="Use LangGraph RAG pipeline"),
     rag_top_k: Optional[int] = Query(None, ge=1, le=20),
     rag_temperature: Optional[float] = Query(None, ge=0.0, le=2.0),
@@ -436,11 +624,11 @@ def stream_message(
     - content: user message content to send
     - model, temperature, api_base: optional overrides
     """
-    log.info("Stream start: user=%s chat_id=%s len=%d model=%s", getattr(user, 'id', '?'), chat_id, len(content or ""), model or OPENAI_MODEL)
+    log.info("Stream start: user=%s chat_id=%s len=%d model=%s", getattr(user, 'id', '?'), chat_id, len(content or ""), model or openai_config.model)
     if use_rag and not RAG_ALLOW_STREAMING:
         raise HTTPException(status_code=400, detail="RAG streaming is not enabled")
 
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    chat = await db.get(Chat, chat_id)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     ensure_owner_or_admin(chat, user)
@@ -460,7 +648,7 @@ def stream_message(
             user_data["config"] = rag_stream_config
 
     user_msg = Message(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         chat_id=chat_id,
         role="user",
         content=content,
@@ -469,286 +657,65 @@ def stream_message(
         updated_at=ts,
     )
     db.add(user_msg)
-    transcript = list(chat.chat or [])
+    # Build messages for OpenAI before the commit expires the loaded chat
+    api_messages = messages_for_api(chat.chat or [], content)
     user_entry: dict[str, Any] = {"role": "user", "content": content, "timestamp": ts}
     if user_data:
         user_entry["data"] = user_data
-    transcript.append(user_entry)
-    chat.chat = transcript
-    chat.updated_at = ts
-    db.commit()
-    log.info("Persisted user message and updated transcript (len=%d)", len(transcript))
-
-    # Build messages for OpenAI
-    messages_for_api = [
-        {"role": m.get("role"), "content": m.get("content")} for m in transcript
-    ]
+    await _append_transcript(db, chat_id, user_entry, ts)
+    await db.commit()
+    log.debug("Persisted user message and updated transcript for chat %s", chat_id)
 
     if use_rag:
         raise HTTPException(status_code=400, detail="Streaming with RAG is not supported yet")
 
-    used_model = model or OPENAI_MODEL
+    llm = openai_config.override(model, api_base)
+    await db.close()
 
-    def get_setting(key: str) -> Optional[str]:
-        s = db.query(Setting).filter(Setting.key == key).first()
-        return (s.value if s and s.value else None)
-
-    api_key = get_setting("openai_api_key")
-    base_url_final = api_base or get_setting("openai_api_base") or OPENAI_API_BASE
-
-    def sse_gen():
+    async def sse_gen():
         assistant_text_parts: list[str] = []
+        stats = StreamStats()
         try:
-            for chunk in stream_chat_completion(
-                messages=messages_for_api,
-                model=used_model,
+            async for chunk in coalesce_chunks(stream_chat_completion(
+                messages=api_messages,
+                model=llm.model,
                 temperature=temperature,
-                api_key=api_key,
-                base_url=base_url_final,
-            ):
+                api_key=llm.api_key,
+                base_url=llm.base_url,
+            )):
                 assistant_text_parts.append(chunk)
-                # Follow SSE spec: each line must be prefixed by 'data: '
-                for line in chunk.splitlines() or [""]:
-                    log.debug("SSE chunk line len=%d", len(line))
-                    yield f"data: {line}\n\n"
+                stats.record(chunk)
+                yield sse_data(chunk)
         except Exception:
             # Fallback to non-streaming if streaming fails
             log.warning("Streaming failed, falling back to non-streaming", exc_info=True)
             try:
-                full = chat_completion(
-                    messages=messages_for_api,
-                    model=used_model,
+                full = await chat_completion(
+                    messages=api_messages,
+                    model=llm.model,
                     temperature=temperature,
-                    api_key=api_key,
-                    base_url=base_url_final,
+                    api_key=llm.api_key,
+                    base_url=llm.base_url,
                 )
                 assistant_text_parts.append(full)
-                for line in full.splitlines() or [""]:
-                    log.debug("SSE fallback line len=%d", len(line))
-                    yield f"data: {line}\n\n"
+                stats.record(full)
+                yield sse_data(full)
             except Exception as e:
                 # Send error as SSE data for visibility
                 log.error("Non-streaming fallback also failed: %s", e, exc_info=True)
-                yield f"data: Error: {str(e)}\n\n"
+                yield sse_data(f"Error: {e}")
         finally:
-            # Persist assistant message at the end (even if fallback)
-            full_text = "".join(assistant_text_parts)
-            ts2 = int(time.time())
-            try:
-                with SessionLocal() as persist_session:
-                    chat_row = persist_session.query(Chat).filter(Chat.id == chat_id).first()
-                    if not chat_row:
-                        log.warning("Chat %s missing when persisting assistant stream", chat_id)
-                    else:
-                        transcript2 = list(chat_row.chat or [])
-                        transcript_entry_assistant: dict[str, Any] = {
-                            "role": "assistant",
-                            "content": full_text,
-                            "timestamp": ts2,
-                        }
-                        transcript2.append(transcript_entry_assistant)
-                        chat_row.chat = transcript2
-                        chat_row.updated_at = ts2
-
-                        assistant_msg = Message(
-                            id=str(uuid.uuid4()),
-                            chat_id=chat_id,
-                            role="assistant",
-                            content=full_text,
-                            created_at=ts2,
-                            updated_at=ts2,
-                        )
-                        persist_session.add(assistant_msg)
-                        persist_session.commit()
-                        log.info("Persisted assistant message (chars=%d). Sending [DONE]", len(full_text))
-            except Exception:
-                log.error("Failed to persist assistant message for chat %s", chat_id, exc_info=True)
-            yield "data: [DONE]\n\n"
-
-    return StreamingResponse(
-        sse_gen(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",  # for proxies like nginx
-        },
-    )
-
-
-# ============ Guest Chat Endpoints ============
-
-@router.post("/guest/chat", response_model=GuestChatResponse)
-def guest_chat(
-    req: GuestChatRequest,
-    db: Session = Depends(get_db),
-):
-    """Guest chat endpoint - no persistence, memory-only conversation"""
-    log.info("Guest chat: content_len=%d messages_count=%d", len(req.content or ""), len(req.messages or []))
-    
-    # Create a guest user for this request
-    from ..utils.auth import GuestUser
-    user = GuestUser()
-    
-    ts = int(time.time())
-    
-    # Build messages for OpenAI call (include history + new user message)
-    messages_for_api = list(req.messages or [])
-    messages_for_api.append({"role": "user", "content": req.content})
-    
-    # Resolve OpenAI config (DB overrides)
-    def get_setting(key: str) -> Optional[str]:
-        s = db.query(Setting).filter(Setting.key == key).first()
-        return (s.value if s and s.value else None)
-    
-    model = req.model or OPENAI_MODEL
-    api_key = get_setting("openai_api_key")
-    base_url = req.api_base or get_setting("openai_api_base") or OPENAI_API_BASE
-    assistant_content: str
-    assistant_data: Optional[dict[str, Any]] = None
-    
-    if req.use_rag:
-        rag_service = get_rag_service()
-        log.info("Calling RAG service for guest chat")
-        rag_config = {}
-        if req.rag_top_k is not None:
-            rag_config["top_k"] = max(1, int(req.rag_top_k))
-        if req.rag_temperature is not None:
-            rag_config["temperature"] = float(req.rag_temperature)
-        
-        rag_result = rag_service.query(req.content, config=rag_config)
-        assistant_content = rag_result.get("answer", "")
-        assistant_data = {
-            "mode": "rag",
-            "documents": rag_result.get("documents", []),
-            "traces": rag_result.get("traces", []),
-        }
-        if rag_config:
-            assistant_data["config"] = rag_config
-    else:
-        log.info("Calling OpenAI (non-stream) model=%s", model)
-        assistant_content = chat_completion(
-            messages=messages_for_api,
-            model=model,
-            temperature=req.temperature,
-            api_key=api_key,
-            base_url=base_url,
-        )
-    
-    # Update conversation history
-    updated_messages = list(req.messages or [])
-    updated_messages.append({"role": "user", "content": req.content, "timestamp": ts})
-    updated_messages.append({
-        "role": "assistant", 
-        "content": assistant_content, 
-        "timestamp": int(time.time()),
-        "data": assistant_data
-    })
-    
-    return GuestChatResponse(
-        response=assistant_content,
-        messages=updated_messages,
-        data=assistant_data
-    )
-
+            stats.log_summary(log, f"Stream chat={chat_id}")
+            # Runs even after a client disconnect, so the reply is kept either way
+            write = _spawn_write(chat_id, _persist_stream_reply(chat_id, "".join(assistant_text_parts)))
+        # Committed before [DONE]: the client's reload or next message may reach
+        # another worker, which must already see this reply in the transcript.
+        # shield() lets the write finish if the client goes away meanwhile.
+        await asyncio.shield(write)
+        yield SSE_DONE
 
-@router.get("/guest/stream")
-@router.get("/guest-stream")
-def guest_chat_stream(
-    content: str = Query(..., description="User message content"),
-    messages: str = Query("[]", description="Previous conversation history as JSON string"),
-    model: Optional[str] = None,
-    temperature: Optional[float] = None,
-    api_base: Optional[str] = None,
-    use_rag: bool = Query(False, description="Use LangGraph RAG pipeline"),
-    rag_top_k: Optional[int] = Query(None, ge=1, le=20),
-    rag_temperature: Optional[float] = Query(None, ge=0.0, le=2.0),
-    db: Session = Depends(get_db),
-):
-    """Guest chat streaming endpoint - no persistence, memory-only conversation"""
-    log.info("Guest chat stream: content_len=%d", len(content or ""))
-    
-    # Create a guest user for this request
-    from ..utils.auth import GuestUser
-    user = GuestUser()
-    
-    if use_rag and not RAG_ALLOW_STREAMING:
-        raise HTTPException(status_code=400, detail="RAG streaming is not enabled")
-    
-    # Parse previous messages
-    try:
-        prev_messages = json.loads(messages) if messages else []
-    except json.JSONDecodeError:
-        prev_messages = []
-    
-    # Build messages for OpenAI
-    messages_for_api = list(prev_messages)
-    messages_for_api.append({"role": "user", "content": content})
-    
-    if use_rag:
-        raise HTTPException(status_code=400, detail="Streaming with RAG is not supported yet")
-    
-    used_model = model or OPENAI_MODEL
-    
-    def get_setting(key: str) -> Optional[str]:
-        s = db.query(Setting).filter(Setting.key == key).first()
-        return (s.value if s and s.value else None)
-    
-    api_key = get_setting("openai_api_key")
-    base_url_final = api_base or get_setting("openai_api_base") or OPENAI_API_BASE
-    
-    def sse_gen():
-        assistant_text_parts: list[str] = []
-        try:
-            for chunk in stream_chat_completion(
-                messages=messages_for_api,
-                model=used_model,
-                temperature=temperature,
-                api_key=api_key,
-                base_url=base_url_final,
-            ):
-                assistant_text_parts.append(chunk)
-                # Follow SSE spec: each line must be prefixed by 'data: '
-                for line in chunk.splitlines() or [""]:
-                    log.debug("SSE chunk line len=%d", len(line))
-                    yield f"data: {line}\n\n"
-        except Exception:
-            # Fallback to non-streaming if streaming fails
-            log.warning("Streaming failed, falling back to non-streaming", exc_info=True)
-            try:
-                full = chat_completion(
-                    messages=messages_for_api,
-                    model=used_model,
-                    temperature=temperature,
-                    api_key=api_key,
-                    base_url=base_url_final,
-                )
-                assistant_text_parts.append(full)
-                for line in full.splitlines() or [""]:
-                    log.debug("SSE fallback line len=%d", len(line))
-                    yield f"data: {line}\n\n"
-            except Exception as e:
-                # Send error as SSE data for visibility
-                log.error("Non-streaming fallback also failed: %s", e, exc_info=True)
-                yield f"data: Error: {str(e)}\n\n"
-        finally:
-            # Send updated conversation history as final event
-            full_text = "".join(assistant_text_parts)
-            ts = int(time.time())
-            updated_messages = list(prev_messages)
-            updated_messages.append({"role": "user", "content": content, "timestamp": ts})
-            updated_messages.append({"role": "assistant", "content": full_text, "timestamp": int(time.time())})
-            
-            # Send updated messages as JSON
-            yield f"data: {json.dumps({'type': 'messages', 'data': updated_messages})}\n\n"
-            yield "data: [DONE]\n\n"
-    
     return StreamingResponse(
         sse_gen(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        headers=SSE_HEADERS,
     )
@@ -1,24 +1,36 @@
 from __future__ import annotations
 
-import json
 import logging
-from typing import Any, Dict, Generator, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from ..config import RAG_ALLOW_STREAMING
+from ..config import RAG_ALLOW_STREAMING, RAG_ENABLED, RAG_STREAM_COALESCE_BYTES, RAG_STREAM_COALESCE_MS
 from ..constants import API_PREFIX
-from ..rag import get_rag_service
-from ..rag.types import RagConfig, RagResult
 from ..utils.auth import get_current_user
+from ..utils.sse import SSE_HEADERS, coalesce_frames, with_keepalive
+
+if TYPE_CHECKING:
+    from ..rag import RagService
+    from ..rag.types import RagConfig
 
 log = logging.getLogger("mini_webui.rag.router")
 
 router = APIRouter(prefix=f"{API_PREFIX}/rag", tags=["rag"])
 
 
+def _get_service() -> RagService:
+    # LangChain/LangGraph are imported on first use, so they are only paid for
+    # when RAG is on; with it off the routes still answer 503 instead of 404.
+    if not RAG_ENABLED:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="RAG is disabled")
+    from ..rag import get_rag_service
+
+    return get_rag_service()
+
+
 class RagQueryRequest(BaseModel):
     question: str
     top_k: Optional[int] = None
@@ -28,22 +40,25 @@ class RagQueryRequest(BaseModel):
 
 
 class RagQueryResponse(BaseModel):
+    """Response schema (OpenAPI only; the body is encoded directly)."""
+
     answer: str
     documents: list[Dict[str, Any]]
     traces: list[Dict[str, Any]]
 
 
 @router.post("/query", response_model=RagQueryResponse)
-def rag_query(req: RagQueryRequest, user=Depends(get_current_user)):
-    service = get_rag_service()
+async def rag_query(req: RagQueryRequest, user=Depends(get_current_user)):
     if req.streaming:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Use /api/rag/stream for streaming responses",
         )
+    service = _get_service()
     config = _build_config(req.top_k, req.temperature, req.metadata_filter)
-    result = service.query(req.question, config=config)
-    return RagQueryResponse(**result)
+    result = await service.aquery(req.question, config=config)
+    # A Response is sent as-is: the result is not re-validated against RagQueryResponse
+    return Response(content=service.to_json(result), media_type="application/json")
 
 
 def _build_config(top_k: Optional[int], temperature: Optional[float], metadata_filter: Optional[Dict[str, Any]]) -> RagConfig:
@@ -58,7 +73,7 @@ def _build_config(top_k: Optional[int], temperature: Optional[float], metadata_f
 
 
 @router.get("/stream")
-def rag_stream(
+async def rag_stream(
     question: str = Query(..., description="User question"),
     top_k: Optional[int] = Query(None, ge=1, le=20),
     temperature: Optional[float] = Query(None, ge=0.0, le=1.5),
@@ -66,29 +81,36 @@ def rag_stream(
 ):
     if not RAG_ALLOW_STREAMING:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="RAG streaming disabled")
-    service = get_rag_service()
+    service = _get_service()
     config = _build_config(top_k, temperature, metadata_filter=None)
-    generator = service.stream(question, config=config)
+    events = service.astream(question, config=config)
+    frames = coalesce_frames(
+        _sse(events),
+        max_delay=RAG_STREAM_COALESCE_MS / 1000,
+        max_bytes=RAG_STREAM_COALESCE_BYTES,
+    )
     return StreamingResponse(
-        _sse(generator),
+        with_keepalive(frames),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        headers=SSE_HEADERS,
     )
 
 
-def _sse(events: Generator[Dict[str, str], None, None]) -> Generator[str, None, None]:
+_SSE_ERROR = b'event: error\ndata: {"detail":"RAG stream failed"}\n\n'
+_SSE_DONE = b"event: done\ndata: [DONE]\n\n"
+
+
+async def _sse(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    # Async end to end: Starlette iterates it on the event loop, not in a thread.
+    # No yield in a finally: this runs inside a _pump task that is cancelled when
+    # the client goes away, and yielding there would swallow the cancellation.
+    # CancelledError is a BaseException, so the except below lets it through.
     try:
-        for event in events:
+        async for event in events:
             name = event.get("event", "message")
-            payload = event.get("data", "")
-            yield f"event: {name}\n"
-            for line in str(payload).splitlines() or [""]:
-                yield f"data: {line}\n"
-            yield "\n"
-    finally:
-        yield "event: done\n"
-        yield "data: [DONE]\n\n"
+            payload = event.get("data", b"")
+            yield b"event: %s\ndata: %s\n\n" % (name.encode(), payload)
+    except Exception:
+        log.error("RAG stream failed", exc_info=True)
+        yield _SSE_ERROR
+    yield _SSE_DONE
@@ -1,14 +1,28 @@
+import threading
+import time
 import uuid
-from typing import Annotated, Optional, Union
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Annotated, Optional, Tuple, Union
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..internal.db import SessionLocal
+from ..config import AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL
+from ..internal.db import (
+    get_async_session,
+    get_async_sessionmaker,
+    get_read_session as get_read_db,
+    get_session as get_db,
+    get_write_session as get_write_db,
+)
 from ..models.users import User
-from .security import verify_password, get_password_hash, create_access_token, decode_access_token
+from .security import verify_and_update_password, get_password_hash, create_access_token, decode_access_token
 
 
 class GuestUser:
@@ -23,15 +37,80 @@ class GuestUser:
         self.updated_at = 0
 
 
-http_bearer = HTTPBearer(auto_error=False)
+@dataclass(frozen=True)
+class AuthUser:
+    """Snapshot of the authenticated user's row (the fields of UserResponse)."""
+
+    __slots__ = ("id", "name", "email", "role", "profile_image_url", "bio", "is_active", "created_at", "updated_at")
+
+    id: str
+    name: str
+    email: str
+    role: str
+    profile_image_url: Optional[str]
+    bio: Optional[str]
+    is_active: bool
+    created_at: int
+    updated_at: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthUser":
+        return cls(**{name: getattr(user, name) for name in cls.__slots__})
+
+
+# user id -> (loaded at, snapshot), least recently used first. A valid token
+# then costs no query for AUTH_USER_CACHE_TTL seconds; writes to a user in this
+# process call invalidate_user(), other workers see them when the entry expires.
+_user_cache: "OrderedDict[str, Tuple[float, AuthUser]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def _cached_user(user_id: str) -> Optional[AuthUser]:
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= AUTH_USER_CACHE_TTL:
+            del _user_cache[user_id]
+            return None
+        _user_cache.move_to_end(user_id)
+        return entry[1]
+
+
+def _cache_user(user: AuthUser) -> None:
+    if AUTH_USER_CACHE_SIZE <= 0:
+        return
+    with _user_cache_lock:
+        _user_cache[user.id] = (time.monotonic(), user)
+        _user_cache.move_to_end(user.id)
+        while len(_user_cache) > AUTH_USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop a user's cached snapshot after changing their row."""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+async def _load_user(user_id: str) -> Optional[AuthUser]:
+    user = _cached_user(user_id)
+    if user is None:
+        # Session opened only on a cache miss; the context exits before the
+        # handler runs, so the pooled connection isn't held while it awaits the LLM
+        async with get_async_sessionmaker()() as db:
+            row = await db.get(User, user_id)
+        if row is None:
+            return None
+        user = AuthUser.from_user(row)
+        _cache_user(user)
+    return user
 
 
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+http_bearer = HTTPBearer(auto_error=False)
+
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+_ROLE_BY_ID = select(User.role, User.is_active).where(User.id == bindparam("id"))
 
 
 class TokenResponse(BaseModel):
@@ -40,18 +119,24 @@ class TokenResponse(BaseModel):
 
 
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = db.query(User).filter(User.email == email).first()
+    user = db.execute(_USER_BY_EMAIL, {"email": email}).scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    verified, new_hash = verify_and_update_password(password, user.password_hash)
+    if not verified:
         return None
+    if new_hash:
+        # Transparently move bcrypt users onto argon2
+        user.password_hash = new_hash
+        db.commit()
     return user
 
 
 def create_user(db: Session, name: str, email: str, password: str) -> User:
-    if db.query(User).filter(User.email == email).first():
-        raise HTTPException(status_code=400, detail="Email already registered")
-
+    # Hash before touching the database: the slow argon2 step must not run
+    # inside a write transaction. The INSERT is the transaction's first
+    # statement and the unique email constraint rejects duplicates, so there is
+    # no read to upgrade into a write.
     user = User(
         id=str(uuid.uuid4()),
         name=name,
@@ -61,15 +146,18 @@ def create_user(db: Session, name: str, email: str, password: str) -> User:
         is_active=True,
     )
     db.add(user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
     db.refresh(user)
     return user
 
 
-def get_current_user(
+async def get_current_user(
     credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(http_bearer)],
-    db: Annotated[Session, Depends(get_db)],
-) -> Union[User, GuestUser]:
+) -> Union[AuthUser, GuestUser]:
     if credentials is None or credentials.scheme.lower() != "bearer":
         return GuestUser()
 
@@ -83,16 +171,15 @@ def get_current_user(
     if not sub:
         return GuestUser()
 
-    user = db.query(User).filter(User.id == sub).first()
+    user = await _load_user(sub)
     if not user or not getattr(user, "is_active", True):
         return GuestUser()
     return user
 
 
-def get_current_user_required(
+async def get_current_user_required(
     credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(http_bearer)],
-    db: Annotated[Session, Depends(get_db)],
-) -> User:
+) -> AuthUser:
     """Dependency that requires authentication (no guest users)"""
     if credentials is None or credentials.scheme.lower() != "bearer":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
@@ -107,16 +194,28 @@ def get_current_user_required(
     if not sub:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    user = db.query(User).filter(User.id == sub).first()
+    user = await _load_user(sub)
     if not user or not getattr(user, "is_active", True):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
     return user
 
 
-def require_admin(current_user: Annotated[Union[User, GuestUser], Depends(get_current_user)]) -> User:
-    """Dependency that ensures the current user has admin role."""
+async def require_admin(
+    current_user: Annotated[Union[AuthUser, GuestUser], Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> AuthUser:
+    """Dependency that ensures the current user has admin role.
+
+    The role is re-read from the database rather than the user cache, so a
+    revoked admin loses access immediately. Only the two columns are fetched;
+    no ORM object is built.
+    """
     if isinstance(current_user, GuestUser):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
-    if getattr(current_user, "role", "user") != "admin":
+    row = (await db.execute(_ROLE_BY_ID, {"id": current_user.id})).first()
+    await db.commit()
+    if not row or not row.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
+    if row.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privilege required")
     return current_user
@@ -0,0 +1,42 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import GUEST_SESSION_MAX, GUEST_SESSION_MAX_MESSAGES, GUEST_SESSION_TTL
+from .ids import new_id
+
+
+# conversation_id -> (last write, recent history). Least recently used entries
+# are evicted past GUEST_SESSION_MAX; entries idle for GUEST_SESSION_TTL seconds
+# are treated as missing. Per process: with several workers a guest whose
+# request lands elsewhere falls back to the history it sent.
+_sessions: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+
+
+def get_history(conversation_id: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """Return the stored history for ``conversation_id``, or None if unknown or expired."""
+    if not conversation_id:
+        return None
+    entry = _sessions.get(conversation_id)
+    if entry is None:
+        return None
+    saved_at, history = entry
+    if time.monotonic() - saved_at >= GUEST_SESSION_TTL:
+        del _sessions[conversation_id]
+        return None
+    _sessions.move_to_end(conversation_id)
+    return history
+
+
+def save_history(conversation_id: Optional[str], history: List[Dict[str, Any]]) -> str:
+    """Store the last GUEST_SESSION_MAX_MESSAGES turns and return the conversation id.
+
+    Unknown ids are replaced by a fresh one so clients cannot pick their keys.
+    """
+    if not conversation_id or conversation_id not in _sessions:
+        conversation_id = new_id()
+    _sessions[conversation_id] = (time.monotonic(), history[-GUEST_SESSION_MAX_MESSAGES:])
+    _sessions.move_to_end(conversation_id)
+    while len(_sessions) > GUEST_SESSION_MAX:
+        _sessions.popitem(last=False)
+    return conversation_id
@@ -0,0 +1,37 @@
+import os
+import threading
+import time
+import uuid
+
+# UUIDv7 (RFC 9562): 48-bit Unix milliseconds, then a 12-bit counter (rand_a)
+# and 62 random bits. IDs from one process sort in creation order, so new rows
+# land on the rightmost B-tree page instead of a random one.
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+_RAND_B_MASK = (1 << 62) - 1
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Random start with headroom so the counter rarely overflows
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # Counter exhausted within this millisecond: borrow the next one
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), "big") & _RAND_B_MASK
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+
+def new_id() -> str:
+    """Time-ordered primary key in the canonical 36-character form."""
+    return str(uuid7())
@@ -1,22 +1,58 @@
-from typing import Any, Dict, List, Optional, Iterator
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
 import logging
 
+import httpx
 from fastapi import HTTPException, status
-from openai import OpenAI, APIError, APIConnectionError, AuthenticationError, RateLimitError, BadRequestError
+from openai import AsyncOpenAI, APIError, APIConnectionError, AuthenticationError, RateLimitError, BadRequestError
 
 from ..config import OPENAI_API_KEY, OPENAI_API_BASE
+from .response_cache import cache_key, get_response, store_response
 
 log = logging.getLogger("mini_webui.openai")
 
+# One pooled HTTP/2 client for every OpenAI call; opened at startup, closed at shutdown
+_http_client: Optional[httpx.AsyncClient] = None
 
-def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        # SDK clients bound to the old transport must not outlive it
+        _sdk_client.cache_clear()
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(600.0, connect=5.0),
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _sdk_client.cache_clear()
+
+
+@lru_cache(maxsize=16)
+def _sdk_client(api_key: str, base_url: str) -> AsyncOpenAI:
+    # One SDK client per (key, endpoint), reused across requests; the admin
+    # settings and per-request api_base overrides only yield a handful of pairs.
+    # A rotated key gets its own entry; call _sdk_client.cache_clear() to drop
+    # clients still holding the old one.
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=get_http_client())
+
+
+def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
     key = api_key or OPENAI_API_KEY
     if not key:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OPENAI_API_KEY is not configured")
-    return OpenAI(api_key=key, base_url=base_url or OPENAI_API_BASE)
+    return _sdk_client(key, base_url or OPENAI_API_BASE)
 
 
-def chat_completion(
+async def chat_completion(
     messages: List[Dict[str, Any]],
     model: str,
     temperature: Optional[float] = None,
@@ -26,12 +62,19 @@ def chat_completion(
     """Call OpenAI Chat Completions API and return assistant content.
 
     Raises HTTPException on API errors to propagate meaningful status codes.
+    Low-temperature requests are answered from the response cache when possible.
     """
+    key = cache_key(model, messages, temperature, base_url)
+    cached = get_response(key)
+    if cached is not None:
+        log.info("OpenAI chat_completion: cache hit model=%s, chars=%d", model, len(cached))
+        return cached
+
     client = get_client(api_key=api_key, base_url=base_url)
-    log.info(f"OpenAI chat_completion: model=%s, temp=%s, msgs=%d", model, temperature, len(messages))
+    log.info("OpenAI chat_completion: model=%s, temp=%s, msgs=%d", model, temperature, len(messages))
 
     try:
-        resp = client.chat.completions.create(
+        resp = await client.chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
@@ -39,6 +82,7 @@ def chat_completion(
         choice = resp.choices[0]
         content = choice.message.content or ""
         log.info("OpenAI chat_completion: received %d chars", len(content or ""))
+        store_response(key, content)
         return content
     except AuthenticationError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
@@ -54,35 +98,52 @@ def chat_completion(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-def stream_chat_completion(
+async def stream_chat_completion(
     messages: List[Dict[str, Any]],
     model: str,
     temperature: Optional[float] = None,
     api_key: Optional[str] = None,
     base_url: Optional[str] = None,
-) -> Iterator[str]:
+) -> AsyncIterator[str]:
     """Yield assistant content chunks from OpenAI as they arrive.
 
     Yields plain text chunks (no SSE framing). Caller can wrap for SSE.
+    A cached low-temperature response is replayed as a single chunk; a stream
+    that completes is stored for later requests.
     """
+    key = cache_key(model, messages, temperature, base_url)
+    cached = get_response(key)
+    if cached is not None:
+        log.info("OpenAI stream_chat: cache hit model=%s, chars=%d", model, len(cached))
+        yield cached
+        return
+
     client = get_client(api_key=api_key, base_url=base_url)
-    log.info(f"OpenAI stream_chat: model=%s, temp=%s, msgs=%d", model, temperature, len(messages))
+    log.info("OpenAI stream_chat: model=%s, temp=%s, msgs=%d", model, temperature, len(messages))
+    pieces: List[str] = []
+    n_chunks = total_chars = 0
     try:
-        stream = client.chat.completions.create(
+        stream = await client.chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
             stream=True,
         )
-        for chunk in stream:
+        # Hot path: no per-chunk logging, totals are reported once at the end
+        async for chunk in stream:
             try:
-                delta = chunk.choices[0].delta
-                if delta and getattr(delta, "content", None):
-                    piece = delta.content  # type: ignore[attr-defined]
-                    log.debug("OpenAI stream_chat: chunk len=%d", len(piece or ""))
-                    yield piece
-            except Exception:
+                piece = chunk.choices[0].delta.content
+            except (AttributeError, IndexError):
                 continue
+            if piece:
+                n_chunks += 1
+                total_chars += len(piece)
+                if key is not None:
+                    pieces.append(piece)
+                yield piece
+        log.info("OpenAI stream_chat: done chunks=%d, chars=%d", n_chunks, total_chars)
+        if key is not None:
+            store_response(key, "".join(pieces))
     except AuthenticationError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
     except RateLimitError as e:
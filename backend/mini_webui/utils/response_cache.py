@@ -0,0 +1,67 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import RESPONSE_CACHE_MAX_TEMPERATURE, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+
+try:
+    import orjson
+
+    def _key_bytes(payload: Any) -> bytes:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+except ImportError:  # pragma: no cover - optional speedup
+
+    def _key_bytes(payload: Any) -> bytes:
+        return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+# digest -> (stored at, completion text), least recently used first. Only
+# near-deterministic calls are cached, so a hit is what the model would
+# (almost certainly) have answered anyway.
+_responses: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+
+
+def cache_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float],
+    base_url: Optional[str],
+) -> Optional[bytes]:
+    """Digest identifying a completion request, or None when it should not be cached.
+
+    Requests without an explicit temperature at or below
+    RESPONSE_CACHE_MAX_TEMPERATURE are sampled and never cached.
+    """
+    if RESPONSE_CACHE_SIZE <= 0 or temperature is None or temperature > RESPONSE_CACHE_MAX_TEMPERATURE:
+        return None
+    return hashlib.blake2b(_key_bytes([base_url, model, temperature, messages]), digest_size=16).digest()
+
+
+def get_response(key: Optional[bytes]) -> Optional[str]:
+    if key is None:
+        return None
+    entry = _responses.get(key)
+    if entry is None:
+        return None
+    stored_at, text = entry
+    if time.monotonic() - stored_at >= RESPONSE_CACHE_TTL:
+        del _responses[key]
+        return None
+    _responses.move_to_end(key)
+    return text
+
+
+def store_response(key: Optional[bytes], text: str) -> None:
+    if key is None or not text:
+        return
+    _responses[key] = (time.monotonic(), text)
+    _responses.move_to_end(key)
+    while len(_responses) > RESPONSE_CACHE_SIZE:
+        _responses.popitem(last=False)
+
+
+def clear_response_cache() -> None:
+    """Forget every cached completion (e.g. after the upstream settings change)."""
+    _responses.clear()
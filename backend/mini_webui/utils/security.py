@@ -1,30 +1,54 @@
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any, Optional
 
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from jose import jwt, JWTError
-from passlib.context import CryptContext
-from passlib.exc import UnknownHashError
+from jose.exceptions import ExpiredSignatureError
 
 from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New hashes use argon2; existing bcrypt hashes still verify and are upgraded on login.
+# The bindings are called directly, without a scheme-dispatch layer in between.
+_argon2 = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plaintext password against a bcrypt hash."""
+    """Verify a plaintext password against an argon2 or bcrypt hash."""
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify a password and return a replacement hash when the stored one is outdated."""
     if not hashed_password:
-        return False
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except UnknownHashError:
-        # Treat legacy/invalid hashes as a simple authentication failure
-        return False
+        return False, None
+    if hashed_password.startswith("$argon2"):
+        try:
+            _argon2.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False, None
+        if _argon2.check_needs_rehash(hashed_password):
+            return True, get_password_hash(plain_password)
+        return True, None
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        try:
+            verified = bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+        except ValueError:
+            # Malformed hash (or a password bcrypt refuses)
+            return False, None
+        return verified, get_password_hash(plain_password) if verified else None
+    # Treat legacy/invalid hashes as a simple authentication failure
+    return False, None
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt."""
-    return pwd_context.hash(password)
+    """Hash a password using argon2."""
+    return _argon2.hash(password)
 
 
 def create_access_token(data: dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -44,5 +68,16 @@ def decode_access_token(token: str) -> dict[str, Any]:
 
     Raises JWTError if invalid/expired.
     """
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    return payload
+    payload = _verified_claims(token)
+    # A cached token is still checked against the clock on every use
+    exp = payload.get("exp")
+    if exp is not None and exp <= time.time():
+        raise ExpiredSignatureError("Signature has expired.")
+    return dict(payload)
+
+
+@lru_cache(maxsize=4096)
+def _verified_claims(token: str) -> dict[str, Any]:
+    # Signature check + JSON parse once per distinct token; SECRET_KEY and
+    # ALGORITHM are fixed for the process. Failures raise, so are never cached.
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
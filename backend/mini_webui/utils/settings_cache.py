@@ -0,0 +1,86 @@
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import OPENAI_API_BASE, OPENAI_MODEL, SETTINGS_CACHE_TTL
+from ..internal.db import get_async_session
+from ..models.settings import Setting
+
+
+# key -> value for every row of the settings table, refreshed at most every
+# SETTINGS_CACHE_TTL seconds. Admin writes invalidate it in this process; other
+# workers pick the change up when their copy expires.
+_settings: Optional[Dict[str, str]] = None
+_loaded_at = 0.0
+_generation = 0
+_lock = threading.Lock()
+
+_ALL_SETTINGS = select(Setting.key, Setting.value)
+
+
+async def get_cached_settings(db: AsyncSession) -> Dict[str, str]:
+    """Return all non-empty settings, reading the table only when the cache is stale.
+
+    A cache hit never executes on ``db``, so the session does not check a
+    connection out of the pool.
+    """
+    global _settings, _loaded_at
+    settings = _settings
+    if settings is not None and time.monotonic() - _loaded_at < SETTINGS_CACHE_TTL:
+        return settings
+
+    generation = _generation
+    rows = await db.execute(_ALL_SETTINGS)
+    settings = {key: value for key, value in rows if value}
+    with _lock:
+        # Don't let a read that raced an invalidation repopulate stale values
+        if generation == _generation:
+            _settings = settings
+            _loaded_at = time.monotonic()
+    return settings
+
+
+def invalidate_settings_cache() -> None:
+    """Drop the cached settings; the next read goes to the database."""
+    global _settings, _generation
+    with _lock:
+        _settings = None
+        _generation += 1
+
+
+@dataclass(frozen=True)
+class OpenAIConfig:
+    """Model and endpoint for an upstream call: admin settings over environment defaults."""
+
+    __slots__ = ("model", "api_key", "base_url")
+
+    model: str
+    api_key: Optional[str]
+    base_url: str
+
+    def override(self, model: Optional[str] = None, api_base: Optional[str] = None) -> "OpenAIConfig":
+        """Apply per-request overrides; unset values keep the configured ones."""
+        if not model and not api_base:
+            return self
+        return replace(self, model=model or self.model, base_url=api_base or self.base_url)
+
+
+async def resolve_openai_config(db: AsyncSession = Depends(get_async_session)) -> OpenAIConfig:
+    """FastAPI dependency: the OpenAI config from the cached settings.
+
+    On a cache miss the settings read opens a transaction; it is ended here so
+    the connection is back in the pool before the handler awaits the model.
+    """
+    settings = await get_cached_settings(db)
+    if db.in_transaction():
+        await db.commit()
+    return OpenAIConfig(
+        model=OPENAI_MODEL,
+        api_key=settings.get("openai_api_key"),
+        base_url=settings.get("openai_api_base") or OPENAI_API_BASE,
+    )
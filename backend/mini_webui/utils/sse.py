@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator
+
+from ..config import (
+    SSE_BATCH_GROWTH,
+    SSE_FLUSH_CHARS,
+    SSE_FLUSH_INTERVAL,
+    SSE_KEEPALIVE_INTERVAL,
+    SSE_MAX_BATCH,
+    SSE_MIN_BATCH,
+)
+
+try:
+    import orjson
+
+    def _json_bytes(payload: Any) -> bytes:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:  # pragma: no cover - optional speedup
+
+    def _json_bytes(payload: Any) -> bytes:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+SSE_DATA = b"data: "
+SSE_DONE = b"data: [DONE]\n\n"
+# Comment line: ignored by EventSource clients, but keeps idle proxies from closing the stream
+SSE_PING = b": ping\n\n"
+_SSE_CONTINUATION = b"\n" + SSE_DATA
+
+# Response headers for every event stream. Proxies must neither buffer nor
+# compress it: gzip holds bytes back until a block fills, stalling tokens.
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Content-Encoding": "identity",
+    "X-Accel-Buffering": "no",  # for proxies like nginx
+}
+
+_DONE = object()
+SSE_QUEUE_SIZE = 64
+
+
+def sse_data(text: str) -> bytes:
+    """Encode ``text`` as one SSE event, continuing embedded newlines as ``data:`` lines."""
+    return SSE_DATA + text.encode("utf-8").replace(b"\n", _SSE_CONTINUATION) + b"\n\n"
+
+
+def sse_json(payload: Any) -> bytes:
+    """Encode ``payload`` as a one-line JSON SSE event (JSON escapes newlines)."""
+    return SSE_DATA + _json_bytes(payload) + b"\n\n"
+
+
+class StreamStats:
+    """Per-stream counters, logged once on completion instead of per frame."""
+
+    __slots__ = ("started", "first_at", "chunks", "chars")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.first_at = None
+        self.chunks = 0
+        self.chars = 0
+
+    def record(self, chunk: str) -> None:
+        if self.first_at is None:
+            self.first_at = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(chunk)
+
+    def log_summary(self, logger: logging.Logger, label: str) -> None:
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        ttft = self.first_at - self.started if self.first_at is not None else -1.0
+        logger.info(
+            "%s done: chars=%d chunks=%d ttft_ms=%.1f total_ms=%.1f",
+            label,
+            self.chars,
+            self.chunks,
+            ttft * 1000,
+            (time.perf_counter() - self.started) * 1000,
+        )
+
+
+class _Failure:
+    __slots__ = ("exc",)
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+async def _pump(source: AsyncIterator[Any], queue: asyncio.Queue) -> None:
+    # Feed ``source`` into ``queue``, then a _Failure (if it raised) and _DONE.
+    # Cancellation (consumer gone) propagates without sentinels: nobody reads them.
+    try:
+        async for item in source:
+            await queue.put(item)
+    except Exception as exc:
+        await queue.put(_Failure(exc))
+    await queue.put(_DONE)
+
+
+def _queue() -> asyncio.Queue:
+    # Bounded: a slow client pushes back on the producer instead of the whole
+    # stream piling up in memory
+    return asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[str],
+    *,
+    min_batch: int = SSE_MIN_BATCH,
+    max_batch: int = SSE_MAX_BATCH,
+    growth: int = SSE_BATCH_GROWTH,
+    flush_chars: int = SSE_FLUSH_CHARS,
+    flush_interval: float = SSE_FLUSH_INTERVAL,
+) -> AsyncIterator[str]:
+    """Merge a token stream into fewer, larger pieces for SSE.
+
+    A batch is flushed once it holds ``batch`` chunks, ``flush_chars``
+    characters, or its first chunk is ``flush_interval`` seconds old. The batch
+    size starts at ``min_batch`` (so the first token goes out alone) and grows
+    by ``growth`` up to ``max_batch``. An error from ``chunks`` is re-raised
+    after whatever was already received has been yielded.
+    """
+    loop = asyncio.get_running_loop()
+    queue = _queue()
+    producer = asyncio.create_task(_pump(chunks, queue))
+    batch = max(1, min_batch)
+    max_batch = max(batch, max_batch)
+    growth = max(1, growth)
+    buffer: list[str] = []
+    size = 0
+    deadline = 0.0
+    try:
+        while True:
+            if buffer:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    item = None
+            else:
+                item = await queue.get()
+
+            if isinstance(item, str):
+                if not buffer:
+                    deadline = loop.time() + flush_interval
+                buffer.append(item)
+                size += len(item)
+                if len(buffer) < batch and size < flush_chars:
+                    continue
+                batch = min(max_batch, batch * growth)
+            if buffer:
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+    finally:
+        producer.cancel()
+
+
+async def coalesce_frames(frames: AsyncIterator[bytes], *, max_delay: float, max_bytes: int) -> AsyncIterator[bytes]:
+    """Join complete SSE ``frames`` into fewer socket writes.
+
+    Frames arriving within ``max_delay`` seconds of the first buffered one are
+    written together, unless ``max_bytes`` is reached first. Frame boundaries
+    are untouched, so clients see the same events. ``max_delay <= 0`` passes
+    frames straight through.
+    """
+    if max_delay <= 0:
+        async for frame in frames:
+            yield frame
+        return
+    loop = asyncio.get_running_loop()
+    queue = _queue()
+    producer = asyncio.create_task(_pump(frames, queue))
+    buffer: list[bytes] = []
+    size = 0
+    deadline = 0.0
+    try:
+        while True:
+            if buffer:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    item = None
+            else:
+                item = await queue.get()
+
+            if isinstance(item, bytes):
+                if not buffer:
+                    deadline = loop.time() + max_delay
+                buffer.append(item)
+                size += len(item)
+                if size < max_bytes:
+                    continue
+            if buffer:
+                yield b"".join(buffer)
+                buffer.clear()
+                size = 0
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+    finally:
+        producer.cancel()
+
+
+async def with_keepalive(frames: AsyncIterator[bytes], interval: float = SSE_KEEPALIVE_INTERVAL) -> AsyncIterator[bytes]:
+    """Pass SSE ``frames`` through, adding a ping whenever none arrived for ``interval`` seconds."""
+    queue = _queue()
+    producer = asyncio.create_task(_pump(frames, queue))
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), interval)
+            except asyncio.TimeoutError:
+                yield SSE_PING
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        producer.cancel()
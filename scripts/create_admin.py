@@ -3,6 +3,7 @@
 Create initial admin user for mini-webui
 """
 
+import argparse
 import sys
 import os
 import uuid
@@ -12,43 +13,69 @@ from getpass import getpass
 # Add the backend directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
+from sqlalchemy import select
+
 from mini_webui.internal.db import get_db
 from mini_webui.models.users import User
 from mini_webui.utils.security import get_password_hash
 
-def create_admin_user():
-    """Create an admin user interactively"""
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Create the initial admin user")
+    parser.add_argument("--name", help="Admin name")
+    parser.add_argument("--email", help="Admin email")
+    password = parser.add_mutually_exclusive_group()
+    password.add_argument("--password", help="Admin password (visible in the process list; prefer --password-stdin)")
+    password.add_argument("--password-stdin", action="store_true", help="Read the password from the first line of stdin")
+    return parser.parse_args()
+
+
+def _prompt(label: str, value, interactive: bool):
+    """Return ``value``, asking for it only when missing and stdin is a terminal."""
+    if value is None and interactive:
+        value = input(f"{label}: ")
+    return (value or "").strip()
+
+
+def create_admin_user(args: argparse.Namespace):
+    """Create an admin user from flags, prompting for missing values on a TTY"""
     print("Creating initial admin user for mini-webui")
     print("=" * 50)
-    
-    # Get user input
-    name = input("Admin name: ").strip()
+
+    interactive = sys.stdin.isatty() and not args.password_stdin
+
+    name = _prompt("Admin name", args.name, interactive)
     if not name:
         print("Error: Name is required")
         return False
     
-    email = input("Admin email: ").strip()
+    email = _prompt("Admin email", args.email, interactive)
     if not email:
         print("Error: Email is required")
         return False
     
-    password = getpass("Admin password: ")
+    if args.password_stdin:
+        password = sys.stdin.readline().rstrip("\r\n")
+    elif args.password is not None:
+        password = args.password
+    elif interactive:
+        password = getpass("Admin password: ")
+        confirm_password = getpass("Confirm password: ")
+        if password != confirm_password:
+            print("Error: Passwords do not match")
+            return False
+    else:
+        password = ""
     if not password:
         print("Error: Password is required")
         return False
     
-    confirm_password = getpass("Confirm password: ")
-    if password != confirm_password:
-        print("Error: Passwords do not match")
-        return False
-    
     # Create user in database
     try:
         with get_db() as db:
             # Check if admin already exists
-            existing_admin = db.query(User).filter(User.role == "admin").first()
-            if existing_admin:
-                print(f"Admin user already exists: {existing_admin.email}")
+            admin_email = db.scalar(select(User.email).where(User.role == "admin").limit(1))
+            if admin_email is not None:
+                print(f"Admin user already exists: {admin_email}")
                 return False
             
             # Create new admin user
@@ -73,7 +100,7 @@ def create_admin_user():
             print(f"   Name: {admin_user.name}")
             print(f"   Email: {admin_user.email}")
             print(f"   Role: {admin_user.role}")
-            print(f"\nNote: Password hashing: bcrypt")
+            print(f"\nNote: Password hashing: argon2")
             
             return True
             
@@ -82,5 +109,5 @@ def create_admin_user():
         return False
 
 if __name__ == "__main__":
-    success = create_admin_user()
+    success = create_admin_user(parse_args())
     sys.exit(0 if success else 1)
@@ -11,6 +11,8 @@ import time
 # Add the backend directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
+from sqlalchemy import select
+
 from mini_webui.internal.db import get_db
 from mini_webui.models.users import User
 from mini_webui.utils.security import get_password_hash
@@ -20,9 +22,9 @@ def create_test_admin():
     try:
         with get_db() as db:
             # Check if admin already exists
-            existing_admin = db.query(User).filter(User.role == "admin").first()
-            if existing_admin:
-                print(f"Admin user already exists: {existing_admin.email}")
+            admin_email = db.scalar(select(User.email).where(User.role == "admin").limit(1))
+            if admin_email is not None:
+                print(f"Admin user already exists: {admin_email}")
                 return True
             
             # Create new admin user
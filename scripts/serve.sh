@@ -0,0 +1,36 @@
+#!/usr/bin/env sh
+# Production launcher for the mini-webui backend.
+#
+# The request path is async end to end (auth, DB, OpenAI, SSE), so a single
+# worker serves thousands of concurrent streams on its event loop; that is the
+# default. uvloop and httptools ship with uvicorn[standard].
+#
+# WORKERS > 1 is not fully supported yet: some state lives in each process.
+#   - Guest conversations (conversation_id) exist only in the worker that
+#     created them; on another worker the client must resend the history.
+#   - The settings, auth-user and LLM response caches are invalidated only in
+#     the worker that handled the admin change; other workers serve stale
+#     values until their TTLs expire (SETTINGS_CACHE_TTL, AUTH_USER_CACHE_TTL,
+#     RESPONSE_CACHE_TTL), so a deactivated user keeps access that long.
+#   - A reply whose stream was cut off is written in the background; only the
+#     same worker's reads wait for it.
+# Each worker also opens its own DB pool (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+#
+# Every knob can be overridden from the environment, and extra uvicorn flags
+# are passed through (a later --access-log re-enables access logging), e.g.
+#   PORT=9000 LIMIT_CONCURRENCY=2000 scripts/serve.sh --access-log
+set -eu
+
+cd "$(dirname "$0")/.."
+
+exec python -m uvicorn backend.mini_webui.main:app \
+    --host "${HOST:-0.0.0.0}" \
+    --port "${PORT:-8080}" \
+    --workers "${WORKERS:-1}" \
+    --loop "${UVICORN_LOOP:-uvloop}" \
+    --http "${UVICORN_HTTP:-httptools}" \
+    --limit-concurrency "${LIMIT_CONCURRENCY:-1000}" \
+    --backlog "${BACKLOG:-2048}" \
+    --timeout-keep-alive "${KEEP_ALIVE:-75}" \
+    --no-access-log \
+    "$@"